@@ -0,0 +1,354 @@
+"""
+NAME: benchmark.py
+CREATED: 18-OCT-26
+LAST EDIT: 18-OCT-26
+CREATOR: Author
+EMAIL:  62926253+kroot-kaytetye@users.noreply.github.com
+PROJECT: kroot
+SUMMARY: Benchmark harness for the analysis functions and pipeline stages. Synthetic syllabified lexicons are generated
+        from Kaytetye-like onset, nucleus and coda inventories (ONSETS, NUCLEI, CODAS), with lexemes of MIN_SYL to
+        MAX_SYL syllables, and orthographic forms are spelled from the same configurations (ORTHOGRAPHY) so that
+        orth_to_ipa can be timed with a rules.csv document. For each lexicon size, every benchmark is timed with
+        time.perf_counter (best and mean of --repeats runs), and its peak memory is measured in a separate run with
+        tracemalloc. The results are saved as .json, and two result documents can be compared with --compare.
+        The benchmarks cover the public functions of info_theory_functions.py, EncodedLexicon, sharded_analysis.py,
+        PhonotacticModel.update, SurprisalScorer.score, bootstrap.py (if numpy is installed) and ConditionalModel, and
+        every pipeline stage but the tests. orth_to_ipa and its stage are only timed with --rules. The inputs of a
+        benchmark are only prepared if it is run (see _BenchmarkInputs), so that --only does not pay for the others.
+EXAMPLE CALLS: python benchmark.py --sizes 1000,10000,100000 --rules C:\\docs\\kroot_docs\\rules.csv --out bench.json
+               python benchmark.py --sizes 1000,10000 --out new.json --compare old.json
+CLASSES:
+    _BenchmarkInputs
+FUNCTIONS:
+    _generate_word_configs
+    _measure
+    _update_model
+    _score_forms
+    _get_benchmarks
+    generate_lexicon
+    generate_orthographic_lexicon
+    run_benchmarks
+    compare_results
+"""
+import argparse
+import datetime
+from functools import cached_property, partial
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+import tracemalloc
+import pandas as ps
+import info_theory_functions as itf
+from conditional_model import ConditionalModel
+from encoded_lexicon import EncodedLexicon
+from get_configurations import get_configurations
+from incremental_model import PhonotacticModel
+import pipeline
+import sharded_analysis
+from surprisal_server import SurprisalScorer
+import validate_lexicon
+
+# configuration inventories, with weights roughly following Kaytetye roots: many initial syllables have no onset, and
+# most syllables have no coda
+ONSETS = {"0": 10, "p": 6, "t": 5, "c": 3, "k": 7, "ʈ": 4, "ṯ": 2, "m": 5, "n": 5, "ɲ": 2, "ŋ": 3, "l": 4, "ʎ": 2,
+          "ḻ": 1, "ɾ": 5, "ɻ": 4, "w": 4, "j": 3, "kw": 3, "ʈw": 1, "mp": 2, "nt": 3, "ŋk": 3, "ɲc": 1, "lk": 1}
+NUCLEI = {"ɐ": 30, "ə": 45, "i": 12, "u": 8, "i:": 3, "ɐ:": 2}
+CODAS = {"0": 85, "n": 3, "l": 3, "ɾ": 3, "ɻ": 2, "m": 2, "ŋ": 1, "ɲ": 1}
+# number of syllables in a lexeme, and its weight
+SYL_COUNTS = {1: 2, 2: 40, 3: 30, 4: 14, 5: 7, 6: 4, 7: 2, 8: 1}
+# spelling of each configuration, in the orthography read by the orth_to_ipa rules
+ORTHOGRAPHY = {"0": "", "p": "p", "t": "t", "c": "ty", "k": "k", "ʈ": "rt", "ṯ": "th", "m": "m", "n": "n", "ɲ": "ny",
+               "ŋ": "ng", "l": "l", "ʎ": "ly", "ḻ": "lh", "ɾ": "rr", "ɻ": "r", "w": "w", "j": "y", "kw": "kw",
+               "ʈw": "rtw", "mp": "mp", "nt": "nt", "ŋk": "ngk", "ɲc": "nty", "lk": "lk", "ɐ": "a", "ə": "e",
+               "i": "i", "u": "u", "i:": "ii", "ɐ:": "aa"}
+MIN_SYL = 1
+MAX_SYL = 8
+DEFAULT_SIZES = [1000, 10000, 100000]
+# worker processes of the sharded benchmarks
+DEFAULT_WORKERS = 2
+# lexemes added and removed by the PhonotacticModel.update benchmark
+UPDATE_SIZE = 100
+# replicates drawn by the bootstrap benchmark
+BOOTSTRAP_REPLICATES = 100
+
+
+class _BenchmarkInputs:
+    """
+    Inputs of the benchmarks for one lexicon size. Each input is only built the first time a benchmark uses it.
+    """
+
+    def __init__(self, size, seed, min_syl, max_syl, out_dir, rules_path=None, workers=DEFAULT_WORKERS):
+        self.size = size
+        self.seed = seed
+        self.min_syl = min_syl
+        self.max_syl = max_syl
+        self.out_dir = out_dir
+        self.rules_path = rules_path
+        self.workers = workers
+
+    @cached_property
+    def lexicon(self):
+        return generate_lexicon(self.size, self.seed, self.min_syl, self.max_syl)
+
+    @cached_property
+    def orth_lexicon(self):
+        return generate_orthographic_lexicon(self.size, self.seed, self.min_syl, self.max_syl)
+
+    @cached_property
+    def configs(self):
+        return sorted(get_configurations(self.lexicon))
+
+    @cached_property
+    def fq_dict(self):
+        return itf.get_frequency_of_each_config_in_word_position(self.lexicon, self.configs)
+
+    @cached_property
+    def surprisals(self):
+        return itf.get_phonotactic_surprisals(self.fq_dict)
+
+    @cached_property
+    def sur_index(self):
+        return itf.get_surprisal_index(self.surprisals)
+
+    @cached_property
+    def encoded_lex(self):
+        return EncodedLexicon.from_lexicon(self.lexicon, self.configs)
+
+    @cached_property
+    def update_lexemes(self):
+        # lexemes of another seed, which are added to the model and then removed
+        return generate_lexicon(UPDATE_SIZE, self.seed + 1, self.min_syl, self.max_syl)
+
+    @cached_property
+    def model(self):
+        return PhonotacticModel.from_lexicon(self.lexicon)
+
+    @cached_property
+    def conditional_model(self):
+        return ConditionalModel.from_lexicon(self.lexicon)
+
+    @cached_property
+    def docs(self):
+        return pipeline.run_info_theory_docs(self.lexicon, self.configs, self.out_dir)
+
+    @cached_property
+    def compiled_rules(self):
+        import rule_compiler
+        return rule_compiler.compile_rule_file(self.rules_path)[0]
+
+    @cached_property
+    def orth_doc_path(self):
+        # kroot.csv of the orth_to_ipa stage
+        path = os.path.join(self.out_dir, "kroot.csv")
+        ps.DataFrame({"words": self.orth_lexicon}).to_csv(path, index=False, encoding="utf-8")
+        return path
+
+
+##########################################
+# Private Functions
+##########################################
+def _generate_word_configs(size, seed, min_syl, max_syl):
+    """
+    Draws the (onset, nucleus, coda) configurations of size lexemes, and yields them one lexeme at a time. The final
+    syllable of a lexeme has no coda, as in the lexicon. Every draw is made for the whole lexicon at once.
+    """
+    rng = random.Random(seed)
+    syl_counts = {count: weight for count, weight in SYL_COUNTS.items() if min_syl <= count <= max_syl}
+    lengths = rng.choices(list(syl_counts), weights=list(syl_counts.values()), k=size)
+    total = sum(lengths)
+    onsets = rng.choices(list(ONSETS), weights=list(ONSETS.values()), k=total)
+    nuclei = rng.choices(list(NUCLEI), weights=list(NUCLEI.values()), k=total)
+    codas = rng.choices(list(CODAS), weights=list(CODAS.values()), k=total)
+    start = 0
+    for length in lengths:
+        end = start + length
+        yield list(zip(onsets[start:end], nuclei[start:end], codas[start:end - 1] + ["0"]))
+        start = end
+
+
+def _measure(function, repeats, memory=True):
+    """
+    Times a function with no arguments, and measures its peak memory in one further run.
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    result = {"seconds": min(times), "mean_seconds": sum(times) / len(times), "repeats": repeats}
+    if memory:
+        tracemalloc.start()
+        function()
+        result["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+
+def _update_model(model, lexemes):
+    """
+    Adds lexemes to a PhonotacticModel and removes them again, so that the model is unchanged for the next run.
+    """
+    model.update(add=lexemes)
+    model.update(remove=lexemes)
+
+
+def _score_forms(scorer, forms):
+    return [scorer.score(form) for form in forms]
+
+
+def _get_benchmarks(rules_path=None):
+    """
+    Returns a dictionary of benchmark name -> function which takes a _BenchmarkInputs, and returns the function with
+    no arguments to be measured. The inputs are built by the first function, so that only the second is measured.
+    """
+    benchmarks = {
+        "get_configurations": lambda inputs: partial(get_configurations, inputs.lexicon),
+        "get_positional_counts": lambda inputs: partial(itf.get_positional_counts, inputs.lexicon),
+        "get_frequency_of_each_config_in_word_position":
+            lambda inputs: partial(itf.get_frequency_of_each_config_in_word_position, inputs.lexicon, inputs.configs),
+        "get_phontactic_entropies": lambda inputs: partial(itf.get_phontactic_entropies, inputs.fq_dict),
+        "get_phonotactic_surprisals": lambda inputs: partial(itf.get_phonotactic_surprisals, inputs.fq_dict),
+        "get_surprisal_index": lambda inputs: partial(itf.get_surprisal_index, inputs.surprisals),
+        "get_surprisals_of_lexicon":
+            lambda inputs: partial(itf.get_surprisals_of_lexicon, inputs.lexicon, inputs.sur_index),
+        "get_leave_one_out_surprisals_of_lexicon":
+            lambda inputs: partial(itf.get_leave_one_out_surprisals_of_lexicon, inputs.lexicon, inputs.fq_dict),
+        "EncodedLexicon.from_lexicon":
+            lambda inputs: partial(EncodedLexicon.from_lexicon, inputs.lexicon, inputs.configs),
+        "EncodedLexicon.get_positional_counts": lambda inputs: inputs.encoded_lex.get_positional_counts,
+        "EncodedLexicon.get_surprisals": lambda inputs: partial(inputs.encoded_lex.get_surprisals, inputs.sur_index),
+        "sharded_analysis.get_count_state_parallel":
+            lambda inputs: partial(sharded_analysis.get_count_state_parallel, inputs.lexicon, inputs.workers),
+        "sharded_analysis.get_surprisals_of_lexicon_parallel":
+            lambda inputs: partial(sharded_analysis.get_surprisals_of_lexicon_parallel, inputs.lexicon,
+                                   inputs.sur_index, inputs.workers),
+        "PhonotacticModel.update": lambda inputs: partial(_update_model, inputs.model, inputs.update_lexemes),
+        # the scorer keeps no scored forms, so that every run scores the lexicon again
+        "SurprisalScorer.score":
+            lambda inputs: partial(_score_forms, SurprisalScorer(inputs.sur_index, cache_size=0), inputs.lexicon),
+        "ConditionalModel.from_lexicon": lambda inputs: partial(ConditionalModel.from_lexicon, inputs.lexicon),
+        "ConditionalModel.get_surprisals_of_lexicon":
+            lambda inputs: partial(inputs.conditional_model.get_surprisals_of_lexicon, inputs.lexicon),
+        "stage: validation": lambda inputs: partial(validate_lexicon.check_lexicon, inputs.lexicon),
+        "stage: configurations":
+            lambda inputs: partial(pipeline.run_configurations, inputs.lexicon, inputs.out_dir, False),
+        "stage: info_theory_docs":
+            lambda inputs: partial(pipeline.run_info_theory_docs, inputs.lexicon, inputs.configs, inputs.out_dir),
+        "stage: summary_tables": lambda inputs: partial(pipeline.run_summary_tables, inputs.docs, inputs.out_dir),
+    }
+    try:
+        import info_theory_arrays as ita
+        import bootstrap
+        benchmarks["get_phontactic_entropies (numpy)"] = \
+            lambda inputs: partial(ita.get_phontactic_entropies, inputs.fq_dict)
+        benchmarks["get_phonotactic_surprisals (numpy)"] = \
+            lambda inputs: partial(ita.get_phonotactic_surprisals, inputs.fq_dict)
+        benchmarks["bootstrap.get_bootstrap_entropies"] = \
+            lambda inputs: partial(bootstrap.get_bootstrap_entropies, inputs.encoded_lex, inputs.configs,
+                                   BOOTSTRAP_REPLICATES)
+    except ImportError:
+        pass
+    if rules_path is not None:
+        import orth_to_ipa
+        benchmarks["orth_to_ipa.convert_words"] = \
+            lambda inputs: partial(orth_to_ipa.convert_words, inputs.orth_lexicon, inputs.compiled_rules)
+        benchmarks["stage: orth_to_ipa"] = \
+            lambda inputs: partial(pipeline.run_orth_to_ipa, inputs.orth_doc_path, rules_path, inputs.out_dir, False)
+    return benchmarks
+
+
+##########################################
+# Public Functions
+##########################################
+def generate_lexicon(size, seed=0, min_syl=MIN_SYL, max_syl=MAX_SYL):
+    """
+    Generates a synthetic syllabified lexicon of size lexemes, with min_syl to max_syl syllables each.
+    """
+    return [".".join(("" if onset == "0" else onset) + nucleus + ("" if coda == "0" else coda)
+                     for onset, nucleus, coda in syls)
+            for syls in _generate_word_configs(size, seed, min_syl, max_syl)]
+
+
+def generate_orthographic_lexicon(size, seed=0, min_syl=MIN_SYL, max_syl=MAX_SYL):
+    """
+    Generates synthetic lexemes in the orthography read by orth_to_ipa, from the same inventories. With the same
+    arguments, these are the lexemes of generate_lexicon.
+    """
+    return ["".join(ORTHOGRAPHY[config] for syl in syls for config in syl)
+            for syls in _generate_word_configs(size, seed, min_syl, max_syl)]
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, repeats=3, seed=0, rules_path=None, memory=True, min_syl=MIN_SYL,
+                   max_syl=MAX_SYL, only=None, workers=DEFAULT_WORKERS):
+    """
+    Runs every benchmark (or those named in only) for each lexicon size, and returns the results as a dictionary. Only
+    the inputs of the benchmarks which are run are built.
+    """
+    benchmarks = {name: prepare for name, prepare in _get_benchmarks(rules_path).items()
+                  if only is None or name in only}
+    results = []
+    with tempfile.TemporaryDirectory() as out_dir:
+        for size in sizes:
+            inputs = _BenchmarkInputs(size, seed, min_syl, max_syl, out_dir, rules_path, workers)
+            for name, prepare in benchmarks.items():
+                result = {"size": size, "benchmark": name}
+                result.update(_measure(prepare(inputs), repeats, memory))
+                print(str(size) + "\t" + name + "\t" + format(result["seconds"], ".4f") + " s")
+                results.append(result)
+    return {"created": datetime.datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(),
+            "platform": platform.platform(), "seed": seed, "min_syl": min_syl, "max_syl": max_syl,
+            "results": results}
+
+
+def compare_results(old_results, new_results):
+    """
+    Matches the benchmarks of two result dictionaries by size and name, and returns the ratio of new to old time (and
+    peak memory, where both were measured) for each.
+    """
+    old_index = {(result["size"], result["benchmark"]): result for result in old_results["results"]}
+    comparison = []
+    for result in new_results["results"]:
+        old = old_index.get((result["size"], result["benchmark"]))
+        if old is None:
+            continue
+        row = {"size": result["size"], "benchmark": result["benchmark"],
+               "time_ratio": result["seconds"] / old["seconds"] if old["seconds"] > 0 else None}
+        if "peak_bytes" in result and old.get("peak_bytes"):
+            row["memory_ratio"] = result["peak_bytes"] / old["peak_bytes"]
+        comparison.append(row)
+    return comparison
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES),
+                        help="comma-separated lexicon sizes, e.g. 1000,10000,10000000")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-syl", type=int, default=MIN_SYL)
+    parser.add_argument("--max-syl", type=int, default=MAX_SYL)
+    parser.add_argument("--rules", help="rules.csv of orth_to_ipa, to also benchmark the ipa conversion")
+    parser.add_argument("--only", help="comma-separated names of the benchmarks to run")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="worker processes of the sharded_analysis benchmarks")
+    parser.add_argument("--no-memory", action="store_true", help="do not measure peak memory (faster for large sizes)")
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument("--compare", help="earlier results .json document to compare against")
+    args = parser.parse_args()
+
+    bench_results = run_benchmarks([int(size) for size in args.sizes.split(",")], args.repeats, args.seed, args.rules,
+                                   not args.no_memory, args.min_syl, args.max_syl,
+                                   args.only.split(",") if args.only else None, args.workers)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(bench_results, f, ensure_ascii=False, indent=1)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous_results = json.load(f)
+        for comparison_row in compare_results(previous_results, bench_results):
+            print(str(comparison_row["size"]) + "\t" + comparison_row["benchmark"] + "\ttime x" +
+                  format(comparison_row["time_ratio"] or 0, ".2f") +
+                  ("\tmemory x" + format(comparison_row["memory_ratio"], ".2f") if "memory_ratio" in comparison_row
+                   else ""))
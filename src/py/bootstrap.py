@@ -0,0 +1,187 @@
+"""
+NAME: bootstrap.py
+CREATED: 18-OCT-26
+LAST EDIT: 18-OCT-26
+CREATOR: Author
+EMAIL:  62926253+kroot-kaytetye@users.noreply.github.com
+PROJECT: kroot
+SUMMARY: Bootstrap confidence intervals for the entropy of each phonotactic position, written to
+        phonological_entropy_ci.csv next to phonological_entropy.csv. Replicates are drawn from the positional count
+        tables in batches, and the entropies of a whole batch are calculated at once with info_theory_arrays.py.
+        Two resampling methods are available:
+        multinomial: each position is resampled on its own, drawing its total count from its configuration
+        probabilities.
+        word: the lexicon is resampled with replacement, so that the positions of a lexeme are drawn together.
+        Each batch has its own seed, spawned from --seed, so the intervals are the same whatever the number of
+        --workers. This module requires numpy.
+EXAMPLE CALL: python bootstrap.py C:\\docs\\kroot_docs\\py_outputs\\phon_syls.txt
+              C:\\docs\\kroot_docs\\py_outputs\\phon_configs.txt --replicates 10000 --method word --workers 4
+FUNCTIONS:
+    _get_word_cells
+    _get_multinomial_batch
+    _get_word_batch
+    get_bootstrap_entropies
+    get_entropy_intervals
+    produce_entropy_ci
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import os
+import numpy as np
+import info_theory_functions as itf
+import info_theory_arrays as ita
+import lex_io
+from encoded_lexicon import EncodedLexicon
+
+METHODS = ["multinomial", "word"]
+# upper limit on the number of lexeme weights expanded to positions in one word batch, to bound memory use
+WORD_BATCH_POSITIONS = 4000000
+
+
+##########################################
+# Private Functions
+##########################################
+def _get_word_cells(encoded_lex, labels, configs):
+    """
+    Returns, for every position in the encoded lexicon sorted by cell, the lexeme it belongs to, together with the
+    cell index (row * number of configurations + column) of each run of positions and the start of each run.
+    """
+    label_rows = np.array([labels.index(label) for label in encoded_lex.labels], dtype=np.int64)
+    config_ids = {config: i for i, config in enumerate(configs)}
+    # configurations that are not in the configuration list are ignored, as in get_frequency_rows_from_counts
+    config_cols = np.array([config_ids.get(config, -1) for config in encoded_lex.configs], dtype=np.int64)
+    position_rows = label_rows[np.frombuffer(encoded_lex.position_labels, dtype=encoded_lex.position_labels.typecode)]
+    position_cols = config_cols[np.frombuffer(encoded_lex.position_configs,
+                                              dtype=encoded_lex.position_configs.typecode)]
+    offsets = np.frombuffer(encoded_lex.offsets, dtype=encoded_lex.offsets.typecode)
+    words = np.repeat(np.arange(len(encoded_lex)), np.diff(offsets))
+    listed = position_cols >= 0
+    cells = position_rows[listed] * len(configs) + position_cols[listed]
+    words = words[listed]
+    order = np.argsort(cells, kind="stable")
+    sorted_cells = cells[order]
+    run_starts = np.flatnonzero(np.r_[True, sorted_cells[1:] != sorted_cells[:-1]])
+    return words[order], sorted_cells[run_starts], run_starts
+
+
+def _get_multinomial_batch(counts, replicates, seed):
+    """
+    Draws replicates of the count matrix, resampling each row from its own configuration probabilities, and returns
+    their entropies as an array of shape (replicates, positions).
+    """
+    rng = np.random.default_rng(seed)
+    samples = np.zeros((replicates,) + counts.shape, dtype=np.int64)
+    totals = counts.sum(axis=1)
+    for row, total in enumerate(totals):
+        if total > 0:
+            samples[:, row, :] = rng.multinomial(total, counts[row] / total, size=replicates)
+    flat = ita.FrequencyMatrix(None, None, samples.reshape(-1, counts.shape[1]))
+    return ita.get_entropy_vector(flat).reshape(replicates, counts.shape[0])
+
+
+def _get_word_batch(word_cells, lexeme_count, shape, replicates, seed):
+    """
+    Draws replicates of the lexicon with replacement, and returns the entropies of their count matrices as an array of
+    shape (replicates, positions).
+    """
+    rng = np.random.default_rng(seed)
+    words, cells, run_starts = word_cells
+    # how many times each lexeme is drawn in each replicate, counted from lexicon-sized draws of lexeme indices
+    draws = rng.integers(0, lexeme_count, size=(replicates, lexeme_count))
+    draws += np.arange(replicates)[:, np.newaxis] * lexeme_count
+    weights = np.bincount(draws.ravel(), minlength=replicates * lexeme_count).reshape(replicates, lexeme_count)
+    samples = np.zeros((replicates, shape[0] * shape[1]), dtype=np.int64)
+    samples[:, cells] = np.add.reduceat(weights[:, words], run_starts, axis=1)
+    flat = ita.FrequencyMatrix(None, None, samples.reshape(-1, shape[1]))
+    return ita.get_entropy_vector(flat).reshape(replicates, shape[0])
+
+
+##########################################
+# Public Functions
+##########################################
+def get_bootstrap_entropies(syl_lex, seg_configs, replicates=10000, method="multinomial", seed=0, batch_size=500,
+                            workers=1):
+    """
+    Returns the position labels, and an array of shape (replicates, positions) with the entropy of each position in
+    each bootstrap replicate. syl_lex can be a list of lexemes or an EncodedLexicon. If workers is greater than 1, the
+    batches are drawn in a pool of that many processes.
+    """
+    if method not in METHODS:
+        raise ValueError("Unknown bootstrap method: " + method)
+    encoded_lex = syl_lex if isinstance(syl_lex, EncodedLexicon) else EncodedLexicon.from_lexicon(syl_lex, seg_configs)
+    counts, max_syl = encoded_lex.get_positional_counts()
+    fq_matrix = ita.get_frequency_matrix_from_counts(counts, max_syl, seg_configs)
+    if method == "word":
+        word_cells = _get_word_cells(encoded_lex, fq_matrix.labels, fq_matrix.configs)
+        batch_size = max(1, min(batch_size, WORD_BATCH_POSITIONS // max(1, len(encoded_lex.position_configs))))
+    batch_sizes = [batch_size] * (replicates // batch_size)
+    if replicates % batch_size > 0:
+        batch_sizes.append(replicates % batch_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(batch_sizes))
+    if method == "word":
+        batch_args = [[word_cells] * len(seeds), [len(encoded_lex)] * len(seeds), [fq_matrix.counts.shape] * len(seeds),
+                      batch_sizes, seeds]
+        batch_function = _get_word_batch
+    else:
+        batch_args = [[fq_matrix.counts] * len(seeds), batch_sizes, seeds]
+        batch_function = _get_multinomial_batch
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            batches = list(executor.map(batch_function, *batch_args))
+    else:
+        batches = list(map(batch_function, *batch_args))
+    if len(batches) == 0:
+        return fq_matrix.labels, np.zeros((0, len(fq_matrix.labels)))
+    return fq_matrix.labels, np.concatenate(batches)
+
+
+def get_entropy_intervals(syl_lex, seg_configs, replicates=10000, method="multinomial", confidence=0.95, seed=0,
+                          batch_size=500, workers=1):
+    """
+    Produces one row per position with its entropy (as in get_phontactic_entropies), and the percentile interval,
+    mean and standard error of its bootstrap entropies.
+    """
+    encoded_lex = syl_lex if isinstance(syl_lex, EncodedLexicon) else EncodedLexicon.from_lexicon(syl_lex, seg_configs)
+    labels, boot_entropies = get_bootstrap_entropies(encoded_lex, seg_configs, replicates, method, seed, batch_size,
+                                                     workers)
+    fq_dict = itf.get_frequency_rows_from_counts(*encoded_lex.get_positional_counts(), seg_configs)
+    point_entropies = itf.get_phontactic_entropies(fq_dict)
+    tail = (1 - confidence) / 2 * 100
+    lower, upper = np.percentile(boot_entropies, [tail, 100 - tail], axis=0)
+    means = boot_entropies.mean(axis=0)
+    errors = boot_entropies.std(axis=0, ddof=1)
+    output = []
+    for i, label in enumerate(labels):
+        output.append({"syl": label, "entropy": point_entropies[i]["entropy"], "ci_lower": float(lower[i]),
+                       "ci_upper": float(upper[i]), "bootstrap_mean": float(means[i]),
+                       "bootstrap_se": float(errors[i])})
+    return output
+
+
+def produce_entropy_ci(syl_lex, seg_configs, out_dir, replicates=10000, method="multinomial", confidence=0.95, seed=0,
+                       batch_size=500, workers=1):
+    """
+    Produces the output of get_entropy_intervals, and writes it to phonological_entropy_ci.csv in out_dir.
+    """
+    ci_rows = get_entropy_intervals(syl_lex, seg_configs, replicates, method, confidence, seed, batch_size, workers)
+    lex_io.write_dict_to_csv(ci_rows, "phonological_entropy_ci", out_dir)
+    return ci_rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("syl_lex_dir")
+    parser.add_argument("seg_config_dir")
+    parser.add_argument("--replicates", type=int, default=10000)
+    parser.add_argument("--method", choices=METHODS, default="multinomial")
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=500, help="replicates drawn at once")
+    parser.add_argument("--workers", type=int, default=1, help="number of processes used to draw the batches")
+    args = parser.parse_args()
+    if args.replicates < 2:
+        parser.error("--replicates must be at least 2")
+
+    out_dir = os.path.dirname(args.syl_lex_dir)
+    produce_entropy_ci(lex_io.read_lexicon_file(args.syl_lex_dir), lex_io.read_lexicon_file(args.seg_config_dir),
+                       out_dir, args.replicates, args.method, args.confidence, args.seed, args.batch_size, args.workers)
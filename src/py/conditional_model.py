@@ -0,0 +1,166 @@
+"""
+NAME: conditional_model.py
+CREATED: 18-OCT-26
+LAST EDIT: 18-OCT-26
+CREATOR: Author
+EMAIL:  62926253+kroot-kaytetye@users.noreply.github.com
+PROJECT: kroot
+SUMMARY: Contains ConditionalModel, a phonotactic model in which the configuration of each position is conditioned on
+        the configurations of the positions before it in the lexeme, e.g. an onset given the preceding coda, or a
+        nucleus given its onset. order sets how many preceding positions make up the context; positions before the
+        start of the lexeme are filled with BOUNDARY. With order 0, there is no context, and the entropies and lexical
+        surprisals are those of get_phontactic_entropies and get_surprisals_of_lexicon (up to the order in which the
+        terms of each entropy are summed).
+        Lexemes are split into positions as in info_theory_functions.py. Counts are only kept for the (position label,
+        context) pairs which occur, in dictionaries keyed by those pairs, so memory grows with the observed contexts
+        rather than with every possible one. Probabilities are calculated from the counts when they are needed.
+        Run as a script to write conditional_entropy, conditional_surprisals (a sparse long table with one row per
+        observed position label, context and configuration) and lexical_conditional_surprisals.
+EXAMPLE CALL: python conditional_model.py C:\\docs\\kroot_docs\\py_outputs\\phon_syls.txt --order 2
+CLASSES:
+    ConditionalModel
+"""
+import argparse
+from collections import Counter
+from math import log
+import os
+import info_theory_functions as itf
+import lex_io
+
+# configuration of the positions before the start of a lexeme, in contexts
+BOUNDARY = "#"
+
+
+class ConditionalModel:
+    """
+    counts: (position label, context) -> Counter of the configurations which follow the context in that position.
+    context_totals: (position label, context) -> total count. label_totals: position label -> total count.
+    A context is a tuple of the order configurations before the position.
+    """
+
+    def __init__(self, order=1):
+        if order < 0:
+            raise ValueError("The order of a conditional model cannot be negative")
+        self.order = order
+        self.counts = {}
+        self.context_totals = Counter()
+        self.label_totals = Counter()
+        self.max_syl = 0
+
+    @classmethod
+    def from_lexicon(cls, syl_lex, order=1):
+        model = cls(order)
+        model.add_lexicon(syl_lex)
+        return model
+
+    ##########################################
+    # Private Methods
+    ##########################################
+    def _get_contexts(self, positions):
+        """
+        Returns the (position label, context, configuration) of every position of a lexeme, from the output of
+        itf.get_word_positions.
+        """
+        configs = [BOUNDARY] * self.order + [config for _label, config in positions]
+        return [(label, tuple(configs[i:i + self.order]), config) for i, (label, config) in enumerate(positions)]
+
+    def _get_surprisal(self, label, context, config):
+        """
+        Returns the surprisal of a configuration after a context in a position, or None if it has not been observed
+        there.
+        """
+        context_counts = self.counts.get((label, context))
+        if context_counts is None or context_counts[config] == 0:
+            return None
+        return log(context_counts[config] / self.context_totals[(label, context)], 2) * -1
+
+    ##########################################
+    # Public Methods
+    ##########################################
+    def add_lexicon(self, syl_lex):
+        """
+        Adds the counts of every position of a list of syllabified lexemes, or of an EncodedLexicon.
+        """
+        for _lexeme, positions in itf.iter_word_positions(syl_lex):
+            # there are three positions for each syllable
+            self.max_syl = max(self.max_syl, len(positions) // 3)
+            for label, context, config in self._get_contexts(positions):
+                context_counts = self.counts.get((label, context))
+                if context_counts is None:
+                    context_counts = Counter()
+                    self.counts[(label, context)] = context_counts
+                context_counts[config] = context_counts[config] + 1
+                self.context_totals[(label, context)] = self.context_totals[(label, context)] + 1
+                self.label_totals[label] = self.label_totals[label] + 1
+
+    def get_conditional_entropies(self):
+        """
+        Returns the conditional entropy of each position given its context, in the same form and order as
+        itf.get_phontactic_entropies: the entropy of the configurations after each context, weighted by the
+        probability of the context in the position.
+        """
+        entropies = {}
+        for (label, context), context_counts in self.counts.items():
+            context_total = self.context_totals[(label, context)]
+            entropy = 0
+            for config in sorted(context_counts):
+                prob = context_counts[config] / context_total
+                entropy = entropy + (prob * (log(prob, 2) * -1))
+            entropies[label] = entropies.get(label, 0) + context_total / self.label_totals[label] * entropy
+        return [{"syl": label, "entropy": entropies.get(label, 0)} for label in itf.get_position_labels(self.max_syl)]
+
+    def get_surprisal_rows(self):
+        """
+        Returns one row for each observed position label, context and configuration, with its count and surprisal.
+        The configurations of a context are sorted. Contexts are written as their configurations joined by spaces.
+        """
+        rows = []
+        for (label, context), context_counts in self.counts.items():
+            for config in sorted(context_counts):
+                rows.append({"position": label, "context": " ".join(context), "configuration": config,
+                             "count": context_counts[config],
+                             "surprisal": self._get_surprisal(label, context, config)})
+        return rows
+
+    def get_surprisals_of_lexicon(self, syl_lex):
+        """
+        Produces the mean conditional surprisal of each lexeme in syl_lex, in the same form as
+        itf.get_surprisals_of_lexicon. Lexemes need not be in the model: positions whose configuration has not been
+        observed after its context are counted in unseen_positions, and the mean surprisal of such a lexeme is -1.
+        """
+        out_dict_list = []
+        for lexeme, positions in itf.iter_word_positions(syl_lex):
+            surprisal_value = 0
+            unseen = 0
+            for label, context, config in self._get_contexts(positions):
+                surprisal = self._get_surprisal(label, context, config)
+                if surprisal is None:
+                    unseen = unseen + 1
+                else:
+                    surprisal_value = surprisal_value + surprisal
+            out_dict = {"lexeme": lexeme}
+            if unseen > 0:
+                out_dict["mean_surprisal"] = -1
+            else:
+                # three phonotactic positions for each syllable, excluding final coda
+                out_dict["mean_surprisal"] = surprisal_value / (len(positions) - 1)
+            out_dict["unseen_positions"] = unseen
+            out_dict_list.append(out_dict)
+        return out_dict_list
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("syl_lex_dir")
+    parser.add_argument("--order", type=int, default=1, help="number of preceding positions in each context")
+    args = parser.parse_args()
+    if args.order < 0:
+        parser.error("--order cannot be negative")
+
+    out_dir = os.path.dirname(args.syl_lex_dir)
+    syllabified_lexicon = lex_io.read_lexicon_file(args.syl_lex_dir)
+    conditional_model = ConditionalModel.from_lexicon(syllabified_lexicon, args.order)
+    lex_io.write_dict_to_csv(conditional_model.get_conditional_entropies(), "conditional_entropy", out_dir)
+    lex_io.write_dict_to_csv(conditional_model.get_surprisal_rows(), "conditional_surprisals", out_dir)
+    lex_io.write_dict_to_csv(conditional_model.get_surprisals_of_lexicon(syllabified_lexicon),
+                             "lexical_conditional_surprisals", out_dir)
@@ -0,0 +1,83 @@
+"""
+NAME: count_state.py
+CREATED: 18-OCT-26
+LAST EDIT: 18-OCT-26
+CREATOR: Author
+EMAIL:  62926253+kroot-kaytetye@users.noreply.github.com
+PROJECT: kroot
+SUMMARY: Contains CountState, a compact record of the positional configuration counts of a syllabified lexicon. A
+        lexicon can be folded into a CountState one chunk at a time, states of different chunks can be merged, and a
+        state can be saved to and loaded from a .json document. The frequency rows produced from a state are the same as
+        those of get_frequency_of_each_config_in_word_position for the whole lexicon, so the entropy and surprisal
+        tables can be produced from it with the functions in info_theory_functions.py.
+CLASSES:
+    CountState
+"""
+from collections import Counter
+import json
+import info_theory_functions as itf
+
+
+class CountState:
+    """
+    counts: Counter of (position label, configuration) pairs.
+    max_syl: length of the longest lexeme (in syllables).
+    lexeme_count: number of lexemes added.
+    """
+
+    def __init__(self, counts=None, max_syl=0, lexeme_count=0):
+        self.counts = Counter() if counts is None else counts
+        self.max_syl = max_syl
+        self.lexeme_count = lexeme_count
+
+    def add_lexicon(self, lexicon):
+        """
+        Adds the counts of a list of syllabified lexemes (e.g. a chunk from lex_io.iter_lexicon_chunks).
+        """
+        counts, max_syl = itf.get_positional_counts(lexicon)
+        self.counts.update(counts)
+        self.max_syl = max(self.max_syl, max_syl)
+        self.lexeme_count = self.lexeme_count + len(lexicon)
+        return self
+
+    def merge(self, other):
+        """
+        Adds the counts of another CountState to this one.
+        """
+        self.counts.update(other.counts)
+        self.max_syl = max(self.max_syl, other.max_syl)
+        self.lexeme_count = self.lexeme_count + other.lexeme_count
+        return self
+
+    def get_configurations(self):
+        """
+        Returns the sorted configurations that occur in the counts. This is the same set as get_configurations.
+        """
+        return sorted(set(config for _label, config in self.counts.keys()))
+
+    def get_frequency_rows(self, config_list=None):
+        """
+        Returns the output of get_frequency_of_each_config_in_word_position for the lexemes added to this state. If
+        config_list is not given, the configurations in the counts are used.
+        """
+        if config_list is None:
+            config_list = self.get_configurations()
+        return itf.get_frequency_rows_from_counts(self.counts, self.max_syl, config_list)
+
+    def to_dict(self):
+        counts = [[label, config, count] for (label, config), count in sorted(self.counts.items())]
+        return {"max_syl": self.max_syl, "lexeme_count": self.lexeme_count, "counts": counts}
+
+    @classmethod
+    def from_dict(cls, state_dict):
+        counts = Counter({(label, config): count for label, config, count in state_dict["counts"]})
+        return cls(counts, state_dict["max_syl"], state_dict["lexeme_count"])
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
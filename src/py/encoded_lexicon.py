@@ -0,0 +1,253 @@
+"""
+NAME: encoded_lexicon.py
+CREATED: 18-OCT-26
+LAST EDIT: 18-OCT-26
+CREATOR: Author
+EMAIL:  62926253+kroot-kaytetye@users.noreply.github.com
+PROJECT: kroot
+SUMMARY: Contains EncodedLexicon, a compact form of a syllabified lexicon which is built once and used in place of the
+        list of strings. Each configuration and each position label is interned to a small integer id, and every
+        phonotactic position of every lexeme is stored in two flat arrays (position label ids and configuration ids),
+        with an array of offsets marking where each lexeme starts. Syllables are only split into onset, nucleus and coda
+        once per distinct syllable, while building.
+        Its iter_word_positions, get_positional_counts, get_surprisals and get_leave_one_out_surprisals methods produce
+        the same output as the functions of info_theory_functions.py for the list of lexemes. Those functions hand an
+        encoded lexicon to these methods (they look for the methods, without importing this class), as do the models
+        and the sharded analysis built on them, so no syllable is split again. Lexemes are rebuilt from their
+        configurations when they are needed.
+        split_by_group divides an encoded lexicon into groups of lexemes (see produce_info_theory_docs.py --group-by).
+FUNCTIONS:
+    _get_smallest_array
+CLASSES:
+    EncodedLexicon
+"""
+from array import array
+from collections import Counter
+import info_theory_functions as itf
+from syllable_parser import split_syllable
+
+
+##########################################
+# Private Functions
+##########################################
+def _get_smallest_array(ids, id_count):
+    """
+    Copies a list or array of ids into the array type with the smallest items that can hold id_count different ids.
+    """
+    if id_count <= 256:
+        return array("B", ids)
+    if id_count <= 65536:
+        return array("H", ids)
+    return array("i", ids)
+
+
+class EncodedLexicon:
+    """
+    configs: configuration of each configuration id. labels: position label of each label id.
+    position_labels, position_configs: arrays of the label id and configuration id of every position, lexeme by lexeme.
+    offsets: index of the first position of each lexeme, followed by the total number of positions.
+    """
+
+    def __init__(self, configs, labels, position_labels, position_configs, offsets):
+        self.configs = configs
+        self.labels = labels
+        self.position_labels = position_labels
+        self.position_configs = position_configs
+        self.offsets = offsets
+
+    @classmethod
+    def from_lexicon(cls, syl_lex, config_list=()):
+        """
+        Encodes a syllabified lexicon. The configurations in config_list (e.g. from get_configurations) are given the
+        first ids, in order, and any other configuration is added after them.
+        """
+        config_ids = {}
+        for config in config_list:
+            config_ids.setdefault(config, len(config_ids))
+        label_ids = {}
+        # syllable -> configuration ids of its onset, nucleus and coda
+        syl_cache = {}
+        # (syllable number, is final syllable) -> label ids of its onset, nucleus and coda
+        label_cache = {}
+        position_labels = array("i")
+        position_configs = array("i")
+        offsets = array("i", [0])
+        for lexeme in syl_lex:
+            lex_split = lexeme.split(".")
+            final_syl = len(lex_split) - 1
+            for syl_num, syl in enumerate(lex_split):
+                syl_configs = syl_cache.get(syl)
+                if syl_configs is None:
+                    syl_configs = [config_ids.setdefault(config, len(config_ids)) for config in split_syllable(syl)]
+                    syl_cache[syl] = syl_configs
+                syl_labels = label_cache.get((syl_num, syl_num == final_syl))
+                if syl_labels is None:
+                    # special behaviour if final syllable, as in itf.get_word_positions
+                    if syl_num == final_syl:
+                        labels = [str(syl_num) + "_onset", "final_nucleus", "final_coda"]
+                    else:
+                        labels = [str(syl_num) + "_onset", str(syl_num) + "_nucleus", str(syl_num) + "_coda"]
+                    syl_labels = [label_ids.setdefault(label, len(label_ids)) for label in labels]
+                    label_cache[(syl_num, syl_num == final_syl)] = syl_labels
+                position_configs.extend(syl_configs)
+                position_labels.extend(syl_labels)
+            offsets.append(len(position_configs))
+        # there are far fewer configurations and labels than positions, so the ids are stored in the smallest array type
+        return cls(list(config_ids), list(label_ids), _get_smallest_array(position_labels, len(label_ids)),
+                   _get_smallest_array(position_configs, len(config_ids)), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        """
+        An integer index returns the lexeme as a string. A slice returns an EncodedLexicon of those lexemes, sharing the
+        configuration and label ids of this one.
+        """
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError("Slices of an EncodedLexicon must be consecutive")
+            stop = max(start, stop)
+            first, last = self.offsets[start], self.offsets[stop]
+            offsets = array("i", [offset - first for offset in self.offsets[start:stop + 1]])
+            return EncodedLexicon(self.configs, self.labels, self.position_labels[first:last],
+                                  self.position_configs[first:last], offsets)
+        if index < 0:
+            index = index + len(self)
+        return self._decode(self.offsets[index], self.offsets[index + 1])
+
+    def __iter__(self):
+        offsets = self.offsets
+        for i in range(len(self)):
+            yield self._decode(offsets[i], offsets[i + 1])
+
+    def _decode(self, start, end):
+        """
+        Rebuilds a lexeme from the configurations of its positions. Empty onsets and codas are stored as "0".
+        """
+        syls = []
+        for p in range(start, end, 3):
+            onset, nucleus, coda = (self.configs[config_id] for config_id in self.position_configs[p:p + 3])
+            syls.append(("" if onset == "0" else onset) + nucleus + ("" if coda == "0" else coda))
+        return ".".join(syls)
+
+    def get_max_syl(self):
+        """
+        Returns the length of the longest lexeme (in syllables). There are three positions for each syllable.
+        """
+        offsets = self.offsets
+        return max((offsets[i + 1] - offsets[i] for i in range(len(self))), default=0) // 3
+
+    def split_by_group(self, groups):
+        """
+        Splits the lexicon into one EncodedLexicon per group in a single pass, without splitting any syllable again.
+        groups holds, for each lexeme, the groups it belongs to (a lexeme can be in several groups, or in none). Returns
+        a dictionary of group -> EncodedLexicon, in order of first appearance. The parts share the configuration and
+        label ids of this lexicon.
+        """
+        if len(groups) != len(self):
+            raise ValueError("Expected the groups of " + str(len(self)) + " lexemes, got " + str(len(groups)))
+        offsets = self.offsets
+        # group -> position labels, position configurations and offsets of its lexemes
+        parts = {}
+        for i, lexeme_groups in enumerate(groups):
+            start, end = offsets[i], offsets[i + 1]
+            for group in lexeme_groups:
+                part = parts.get(group)
+                if part is None:
+                    part = (array(self.position_labels.typecode), array(self.position_configs.typecode),
+                            array("i", [0]))
+                    parts[group] = part
+                part[0].extend(self.position_labels[start:end])
+                part[1].extend(self.position_configs[start:end])
+                part[2].append(len(part[1]))
+        return {group: EncodedLexicon(self.configs, self.labels, *part) for group, part in parts.items()}
+
+    def iter_word_positions(self):
+        """
+        Same output as itf.iter_word_positions for the decoded lexicon.
+        """
+        configs, labels, offsets = self.configs, self.labels, self.offsets
+        for i in range(len(self)):
+            start, end = offsets[i], offsets[i + 1]
+            yield self._decode(start, end), [(labels[self.position_labels[p]], configs[self.position_configs[p]])
+                                             for p in range(start, end)]
+
+    def get_positional_counts(self):
+        """
+        Same output as itf.get_positional_counts for the decoded lexicon.
+        """
+        id_counts = Counter(zip(self.position_labels, self.position_configs))
+        counts = Counter({(self.labels[label_id], self.configs[config_id]): count
+                          for (label_id, config_id), count in id_counts.items()})
+        return counts, self.get_max_syl()
+
+    def get_surprisals(self, sur_index):
+        """
+        Same output as itf.get_surprisals_of_lexicon for the decoded lexicon. sur_index is the output of
+        itf.get_surprisal_index. As in _get_surprisal_of_syllable, positions with no row in the index contribute 0.
+        """
+        # surprisal of each configuration id, for each label id
+        tables = []
+        for label in self.labels:
+            if label in sur_index:
+                tables.append([sur_index[label].get(config) for config in self.configs])
+            else:
+                tables.append([0] * len(self.configs))
+        labels, configs, offsets = self.position_labels, self.position_configs, self.offsets
+        out_dict_list = []
+        for i in range(len(self)):
+            start, end = offsets[i], offsets[i + 1]
+            surprisal_value = 0
+            for p in range(start, end, 3):
+                surprisal_in_positions = [tables[labels[p]][configs[p]], tables[labels[p + 1]][configs[p + 1]],
+                                          tables[labels[p + 2]][configs[p + 2]]]
+                if None in surprisal_in_positions:
+                    raise KeyError("Configuration has no surprisal in its position: " + self._decode(start, end))
+                surprisal_value = surprisal_value + sum(surprisal_in_positions)
+            out_dict_list.append({"lexeme": self._decode(start, end),
+                                  "mean_surprisal": surprisal_value / (end - start - 1)})
+        return out_dict_list
+
+    def get_leave_one_out_surprisals(self, fq_dict):
+        """
+        Same output as itf.get_leave_one_out_surprisals_of_lexicon for the decoded lexicon.
+        """
+        # count of each configuration id and row total, for each label id. None marks a label with no row
+        count_tables = []
+        row_sums = []
+        fq_index = {fq_row["syllable"]: fq_row for fq_row in fq_dict}
+        for label in self.labels:
+            if label in fq_index:
+                count_tables.append([int(fq_index[label][config]) for config in self.configs])
+                row_sums.append(sum(int(value) for key, value in fq_index[label].items() if key != "syllable"))
+            else:
+                count_tables.append(None)
+                row_sums.append(0)
+        labels, configs, offsets = self.position_labels, self.position_configs, self.offsets
+        out_dict_list = []
+        for i in range(len(self)):
+            start, end = offsets[i], offsets[i + 1]
+            surprisal_value = 0
+            unseen = 0
+            for p in range(start, end, 3):
+                surprisal_in_positions = [0] * 3
+                for j in range(3):
+                    label_id = labels[p + j]
+                    if count_tables[label_id] is not None:
+                        surprisal = itf._get_held_out_surprisal(count_tables[label_id][configs[p + j]],
+                                                                row_sums[label_id])
+                        if surprisal == -1:
+                            unseen = unseen + 1
+                        else:
+                            surprisal_in_positions[j] = surprisal
+                surprisal_value = surprisal_value + sum(surprisal_in_positions)
+            out_dict = {"lexeme": self._decode(start, end)}
+            if unseen > 0:
+                out_dict["mean_surprisal"] = -1
+            else:
+                out_dict["mean_surprisal"] = surprisal_value / (end - start - 1)
+            out_dict["unseen_positions"] = unseen
+            out_dict_list.append(out_dict)
+        return out_dict_list
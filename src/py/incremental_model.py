@@ -0,0 +1,259 @@
+"""
+NAME: incremental_model.py
+CREATED: 18-OCT-26
+LAST EDIT: 18-OCT-26
+CREATOR: Author
+EMAIL:  62926253+kroot-kaytetye@users.noreply.github.com
+PROJECT: kroot
+SUMMARY: Contains PhonotacticModel, a persisted model of a syllabified lexicon which holds the positional counts,
+        entropies, surprisals and lexical surprisals produced by produce_info_theory_docs.py. Lexemes can be added to
+        or removed from the model. After an update, only the positions whose counts changed have their
+        entropy and surprisals recalculated, so an update costs time in proportion to the edit and the changed rows.
+        Mean surprisals are global in the row totals: every lexeme has a 0_onset, final_nucleus and final_coda, whose
+        totals change with every edit, so keeping them up to date would re-score the whole lexicon on every update.
+        Instead, lexemes are scored when their mean surprisal is read (get_score and get_lexical_surprisals), and the
+        scores are kept until the next update. The tables are the same as those of a full run on the updated lexicon,
+        with the configurations sorted as in phon_configs.txt.
+        The saved model holds the counts and the positions of every lexeme, so it is loaded without counting the
+        lexicon again.
+EXAMPLE CALLS: python incremental_model.py model.json --init phon_syls.txt --write-docs C:\\docs\\kroot_docs\\py_outputs
+               python incremental_model.py model.json --add new.txt --remove old.txt --write-docs ...
+CLASSES:
+    PhonotacticModel
+"""
+import argparse
+from collections import Counter
+import json
+import info_theory_functions as itf
+import lex_io
+
+
+class PhonotacticModel:
+    """
+    counts: position label -> Counter of configurations. config_totals: configuration -> total count.
+    syl_counts: number of syllables -> number of lexemes.
+    entries: lexicon in order, as entry id -> lexeme. Duplicate lexemes have one entry each.
+    word_positions: distinct lexeme -> its (position label, configuration) pairs.
+    entropies, surprisals: results by position label. scores: mean surprisals of the distinct lexemes scored since the
+    last update.
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.config_totals = Counter()
+        self.syl_counts = Counter()
+        self.entries = {}
+        self.lexeme_entries = {}
+        self.next_entry = 0
+        self.word_positions = {}
+        self.config_list = []
+        self.labels = []
+        self.entropies = {}
+        self.surprisals = {}
+        self.scores = {}
+
+    @classmethod
+    def from_lexicon(cls, syl_lex):
+        model = cls()
+        model.update(add=syl_lex)
+        return model
+
+    ##########################################
+    # Private Methods
+    ##########################################
+    def _add_lexeme(self, lexeme, positions, changed_labels):
+        if lexeme not in self.word_positions:
+            self.word_positions[lexeme] = positions
+            self.lexeme_entries[lexeme] = []
+        self.entries[self.next_entry] = lexeme
+        self.lexeme_entries[lexeme].append(self.next_entry)
+        self.next_entry = self.next_entry + 1
+        self._count_lexeme(lexeme, 1, changed_labels)
+
+    def _remove_lexeme(self, lexeme, changed_labels):
+        del self.entries[self.lexeme_entries[lexeme].pop()]
+        self._count_lexeme(lexeme, -1, changed_labels)
+        if len(self.lexeme_entries[lexeme]) == 0:
+            del self.lexeme_entries[lexeme]
+            del self.word_positions[lexeme]
+            self.scores.pop(lexeme, None)
+
+    def _count_lexeme(self, lexeme, change, changed_labels):
+        positions = self.word_positions[lexeme]
+        # there are three positions for each syllable
+        self.syl_counts[len(positions) // 3] += change
+        for label, config in positions:
+            self.counts.setdefault(label, Counter())[config] += change
+            self.config_totals[config] += change
+            changed_labels.add(label)
+
+    def _score_lexeme(self, lexeme):
+        """
+        Scores a lexeme from its stored positions, with the same arithmetic as itf.get_surprisals_of_lexicon.
+        """
+        positions = self.word_positions[lexeme]
+        surprisal_value = 0
+        # sum each syllable (three positions) before adding it to the total
+        for i in range(0, len(positions), 3):
+            surprisal_value = surprisal_value + sum(self.surprisals[label][config]
+                                                    for label, config in positions[i:i + 3])
+        return surprisal_value / (len(positions) - 1)
+
+    def _get_row(self, label):
+        label_counts = self.counts.get(label, Counter())
+        row = {"syllable": label}
+        for config in self.config_list:
+            row[config] = label_counts[config]
+        return row
+
+    ##########################################
+    # Public Methods
+    ##########################################
+    def update(self, add=(), remove=()):
+        """
+        Adds and removes lexemes, then recalculates the positions whose counts changed. The lexemes to add can also be
+        an EncodedLexicon. Returns the changed position labels.
+        """
+        # check the removals before changing anything, so that a failed update leaves the model as it was
+        for lexeme, count in Counter(remove).items():
+            if count > len(self.lexeme_entries.get(lexeme, ())):
+                raise ValueError("Lexeme is not in the model " + str(count) + " time(s): " + lexeme)
+        changed_labels = set()
+        for lexeme in remove:
+            self._remove_lexeme(lexeme, changed_labels)
+        for lexeme, positions in itf.iter_word_positions(add):
+            self._add_lexeme(lexeme, positions, changed_labels)
+
+        config_list = sorted(config for config, total in self.config_totals.items() if total > 0)
+        max_syl = max([syl_count for syl_count, total in self.syl_counts.items() if total > 0], default=0)
+        labels = itf.get_position_labels(max_syl)
+        # new rows have to be calculated, even if nothing was counted in them
+        changed_labels.update(set(labels) - set(self.labels))
+        for label in set(self.labels) - set(labels):
+            del self.entropies[label]
+            del self.surprisals[label]
+        if config_list != self.config_list:
+            self.config_list = config_list
+            # configurations were added or removed, so reorder the surprisals of the unchanged rows. A configuration
+            # that is not counted in a row has a surprisal of -1
+            for label in set(labels) - changed_labels:
+                old_row = self.surprisals[label]
+                self.surprisals[label] = {config: old_row.get(config, -1) for config in config_list}
+        self.labels = labels
+
+        for label in changed_labels & set(labels):
+            row = self._get_row(label)
+            self.entropies[label] = itf._get_phonotactic_entropy(row)["entropy"]
+            surprisal_row = itf._get_phonotactic_surprisal(row)
+            del surprisal_row["syllable"]
+            self.surprisals[label] = surprisal_row
+        if len(changed_labels) > 0:
+            # the row totals changed, so every score is stale (see the summary of this module)
+            self.scores = {}
+        return sorted(changed_labels & set(labels))
+
+    def get_lexicon(self):
+        return list(self.entries.values())
+
+    def get_score(self, lexeme):
+        """
+        Returns the mean surprisal of a lexeme in the model, scoring it if it was not scored since the last update.
+        """
+        score = self.scores.get(lexeme)
+        if score is None:
+            score = self._score_lexeme(lexeme)
+            self.scores[lexeme] = score
+        return score
+
+    def get_frequency_rows(self):
+        """
+        Same output as get_frequency_of_each_config_in_word_position.
+        """
+        return [self._get_row(label) for label in self.labels]
+
+    def get_entropies(self):
+        """
+        Same output as get_phontactic_entropies.
+        """
+        return [{"syl": label, "entropy": self.entropies[label]} for label in self.labels]
+
+    def get_surprisal_rows(self):
+        """
+        Same output as get_phonotactic_surprisals.
+        """
+        output = []
+        for label in self.labels:
+            row = {"syllable": label}
+            row.update(self.surprisals[label])
+            output.append(row)
+        return output
+
+    def get_lexical_surprisals(self):
+        """
+        Same output as get_surprisals_of_lexicon, in lexicon order.
+        """
+        return [{"lexeme": lexeme, "mean_surprisal": self.get_score(lexeme)} for lexeme in self.entries.values()]
+
+    def save(self, path):
+        """
+        Saves the state of the model as a .json document: the entries, the positions of each distinct lexeme, the
+        counts and the cached results.
+        """
+        model_dict = {"entries": [[entry, lexeme] for entry, lexeme in self.entries.items()],
+                      "next_entry": self.next_entry, "word_positions": self.word_positions,
+                      "counts": self.counts, "config_totals": self.config_totals,
+                      "syl_counts": [[syl_count, total] for syl_count, total in self.syl_counts.items()],
+                      "config_list": self.config_list, "labels": self.labels, "entropies": self.entropies,
+                      "surprisals": self.surprisals, "scores": self.scores}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(model_dict, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a saved model. Its state is restored as saved, so nothing is counted or recalculated.
+        """
+        with open(path, encoding="utf-8") as f:
+            model_dict = json.load(f)
+        model = cls()
+        model.entries = {entry: lexeme for entry, lexeme in model_dict["entries"]}
+        for entry, lexeme in model.entries.items():
+            model.lexeme_entries.setdefault(lexeme, []).append(entry)
+        model.next_entry = model_dict["next_entry"]
+        model.word_positions = {lexeme: [tuple(position) for position in positions]
+                                for lexeme, positions in model_dict["word_positions"].items()}
+        model.counts = {label: Counter(label_counts) for label, label_counts in model_dict["counts"].items()}
+        model.config_totals = Counter(model_dict["config_totals"])
+        model.syl_counts = Counter({syl_count: total for syl_count, total in model_dict["syl_counts"]})
+        model.config_list = model_dict["config_list"]
+        model.labels = model_dict["labels"]
+        model.entropies = model_dict["entropies"]
+        model.surprisals = model_dict["surprisals"]
+        model.scores = model_dict["scores"]
+        return model
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("model_path", help=".json document which holds the model")
+    parser.add_argument("--init", help="build a new model from this syllabified lexicon (e.g. phon_syls.txt)")
+    parser.add_argument("--add", help="document of syllabified lexemes to add, one per line")
+    parser.add_argument("--remove", help="document of syllabified lexemes to remove, one per line")
+    parser.add_argument("--write-docs", help="folder to write the information theory documents to")
+    args = parser.parse_args()
+
+    if args.init:
+        phon_model = PhonotacticModel.from_lexicon(lex_io.read_lexicon_file(args.init))
+    else:
+        phon_model = PhonotacticModel.load(args.model_path)
+    added = lex_io.read_lexicon_file(args.add) if args.add else []
+    removed = lex_io.read_lexicon_file(args.remove) if args.remove else []
+    if len(added) > 0 or len(removed) > 0:
+        changed = phon_model.update(added, removed)
+        print(str(len(changed)) + " positions recalculated.")
+    phon_model.save(args.model_path)
+    if args.write_docs:
+        lex_io.write_dict_to_csv(phon_model.get_frequency_rows(), "phonotactic_fqs", args.write_docs)
+        lex_io.write_dict_to_csv(phon_model.get_entropies(), "phonological_entropy", args.write_docs)
+        lex_io.write_dict_to_csv(phon_model.get_surprisal_rows(), "positional_surprisals", args.write_docs)
+        lex_io.write_dict_to_csv(phon_model.get_lexical_surprisals(), "lexical_surprisals", args.write_docs)
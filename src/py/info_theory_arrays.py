@@ -0,0 +1,144 @@
+"""
+NAME: info_theory_arrays.py
+CREATED: 18-OCT-26
+LAST EDIT: 18-OCT-26
+CREATOR: Author
+EMAIL:  62926253+kroot-kaytetye@users.noreply.github.com
+PROJECT: kroot
+SUMMARY: Optional NumPy backend for info_theory_functions.py. Positional frequencies are held as a dense position x
+        configuration count matrix, and row totals, probabilities, entropies and surprisals are each calculated for the
+        whole matrix in one vectorised pass. The list outputs match get_phontactic_entropies and
+        get_phonotactic_surprisals (to floating point rounding), including the -1 convention for zero-count cells.
+        This module requires numpy, and is only imported when the numpy backend is selected.
+FUNCTIONS:
+    _to_frequency_matrix
+    get_frequency_matrix
+    get_frequency_matrix_from_counts
+    get_entropy_vector
+    get_surprisal_matrix
+    get_phontactic_entropies
+    get_phonotactic_surprisals
+    get_surprisal_index
+"""
+from collections import namedtuple
+import numpy as np
+import info_theory_functions as itf
+
+# labels: row labels (e.g. "0_onset"), configs: column labels, counts: int64 array of shape (labels, configs)
+FrequencyMatrix = namedtuple("FrequencyMatrix", ["labels", "configs", "counts"])
+
+
+##########################################
+# Private Functions
+##########################################
+def _to_frequency_matrix(fq_dict):
+    """
+    Accepts either a FrequencyMatrix or the output of get_frequency_of_each_config_in_word_position.
+    """
+    if isinstance(fq_dict, FrequencyMatrix):
+        return fq_dict
+    return get_frequency_matrix(fq_dict)
+
+
+##########################################
+# Public Functions
+##########################################
+def get_frequency_matrix(fq_dict):
+    """
+    Converts the output of get_frequency_of_each_config_in_word_position (or phonotactic_fqs.csv as read by
+    lex_io.read_csv) into a FrequencyMatrix. An empty table gives an empty matrix.
+    """
+    labels = [row["syllable"] for row in fq_dict]
+    configs = [key for key in fq_dict[0].keys() if key != "syllable"] if len(fq_dict) > 0 else []
+    counts = np.array([[int(row[config]) for config in configs] for row in fq_dict], dtype=np.int64)
+    return FrequencyMatrix(labels, configs, counts.reshape(len(labels), len(configs)))
+
+
+def get_frequency_matrix_from_counts(counts, max_syl, config_list):
+    """
+    Builds a FrequencyMatrix directly from the output of itf.get_positional_counts, without building the frequency rows.
+    Configurations that are not in config_list are ignored, as in get_frequency_rows_from_counts.
+    """
+    labels = itf.get_position_labels(max_syl)
+    configs = list(dict.fromkeys(config_list))
+    label_ids = {label: i for i, label in enumerate(labels)}
+    config_ids = {config: i for i, config in enumerate(configs)}
+    matrix = np.zeros((len(labels), len(configs)), dtype=np.int64)
+    rows = []
+    cols = []
+    values = []
+    for (label, config), count in counts.items():
+        if config in config_ids and label in label_ids:
+            rows.append(label_ids[label])
+            cols.append(config_ids[config])
+            values.append(count)
+    matrix[rows, cols] = values
+    return FrequencyMatrix(labels, configs, matrix)
+
+
+def get_entropy_vector(fq_matrix):
+    """
+    Returns the entropy of every row of a FrequencyMatrix as a float array. Rows with no counts have an entropy of 0.
+    """
+    counts = fq_matrix.counts
+    totals = counts.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        probs = counts / totals[:, np.newaxis]
+        info = np.where(counts > 0, probs * ((np.log(probs) / np.log(2)) * -1), 0.0)
+    if info.shape[1] == 0:
+        return np.zeros(info.shape[0])
+    # a running sum adds the terms in the same order as _get_phonotactic_entropy, so the results are identical
+    return info.cumsum(axis=1)[:, -1]
+
+
+def get_surprisal_matrix(fq_matrix):
+    """
+    Returns the surprisal of every cell of a FrequencyMatrix as a float array. Cells with a count of 0, including every
+    cell of a row with no counts, are set to -1.
+    """
+    counts = fq_matrix.counts
+    totals = counts.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        surprisals = (np.log(counts / totals[:, np.newaxis]) / np.log(2)) * -1
+    surprisals[counts == 0] = -1
+    return surprisals
+
+
+def get_phontactic_entropies(fq_dict):
+    """
+    Vectorised equivalent of itf.get_phontactic_entropies. Accepts frequency rows or a FrequencyMatrix.
+    """
+    fq_matrix = _to_frequency_matrix(fq_dict)
+    entropies = get_entropy_vector(fq_matrix).tolist()
+    empty_rows = (fq_matrix.counts.sum(axis=1) == 0).tolist()
+    output = []
+    for label, entropy, empty in zip(fq_matrix.labels, entropies, empty_rows):
+        # rows without counts are left as an integer 0, as in _get_phonotactic_entropy
+        output.append({"syl": label, "entropy": 0 if empty else entropy})
+    return output
+
+
+def get_phonotactic_surprisals(fq_dict):
+    """
+    Vectorised equivalent of itf.get_phonotactic_surprisals. Accepts frequency rows or a FrequencyMatrix.
+    """
+    fq_matrix = _to_frequency_matrix(fq_dict)
+    surprisals = get_surprisal_matrix(fq_matrix).astype(object)
+    # keep the -1 sentinel as an integer, as in _get_phonotactic_surprisal
+    surprisals[fq_matrix.counts == 0] = -1
+    output = []
+    for label, sur_row in zip(fq_matrix.labels, surprisals.tolist()):
+        row = {"syllable": label}
+        row.update(zip(fq_matrix.configs, sur_row))
+        output.append(row)
+    return output
+
+
+def get_surprisal_index(fq_dict):
+    """
+    Builds the lookup table of itf.get_surprisal_index straight from the frequency matrix, for use with
+    itf.get_surprisals_of_lexicon.
+    """
+    fq_matrix = _to_frequency_matrix(fq_dict)
+    surprisals = get_surprisal_matrix(fq_matrix).tolist()
+    return {label: dict(zip(fq_matrix.configs, sur_row)) for label, sur_row in zip(fq_matrix.labels, surprisals)}
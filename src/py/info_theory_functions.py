@@ -1,156 +1,38 @@
 """
 NAME: info_theory_functions.py
 CREATED: 16-JAN-20
-LAST EDIT: 23-MAR-20
+LAST EDIT: 18-OCT-26
 CREATOR: Author
 EMAIL:  62926253+kroot-kaytetye@users.noreply.github.com
 PROJECT: kroot
 SUMMARY: Contains functions relevant to the information theoretic analysis of Kaytetye syllabified roots.
+        A lexicon can be a list of syllabified lexemes, or an object with its own methods for counting and scoring
+        (e.g. an EncodedLexicon), which the functions below hand it to, so that no syllable is split again.
 FUNCTIONS:
-    _update_dict
-    _get_max_syl_count
-    _get_frequency_of_segment_in_list
-    _split_syllable_into_phonotactic_positions
-    _get_frequency_of_configurations_in_syllable
     _get_phonotactic_entropy
     _get_phonotactic_surprisal
     _get_surprisal_of_syllable
+    _get_held_out_surprisal
+    get_word_positions
+    get_position_labels
+    iter_word_positions
+    get_positional_counts
+    get_frequency_rows_from_counts
     get_frequency_of_each_config_in_word_position
     get_phontactic_entropies
+    get_surprisal_index
     get_surprisals_of_lexicon
     get_phonotactic_surprisals
+    get_leave_one_out_surprisals_of_lexicon
 """
+from collections import Counter
 from math import log
-import re
+from syllable_parser import split_syllable
 
 
 ##########################################
 # Private Functions
 ##########################################
-def _update_dict(dict_1, dict_2):
-    """
-    Combines the two provided Dictionaries
-    """
-    new_dict = {}
-    for key in dict_1.keys():
-        new_dict[key] = dict_1[key] + dict_2[key]
-    return new_dict
-
-
-def _get_max_syl_count(lexicon):
-    """
-    Counts the length of all words in the input syllabified lexicon, and returns the longest word (in terms of syllables)
-    in the lexicon.
-    """
-    max_syl = 0
-    for lex in lexicon:
-        if len(lex.split(".")) > max_syl:
-            max_syl = len(lex.split("."))
-    return max_syl
-
-
-def _get_frequency_of_segment_in_list(seg, seg_list):
-    """
-    Counts the frequency of a given segment or token in a list of segments/tokens.
-    """
-    return seg_list.count(seg)
-
-
-def _split_syllable_into_phonotactic_positions(syllable):
-    """
-    Takes an input syllable, and outputs a three-member list. The first member is the onset. The second member is the
-    nucleus. The third member is the coda.
-    """
-    # alternative splitting of syllable into onset and coda, rather than using a syllabic template
-    vowel_regex = "[ɐəiu:]"
-    p = re.compile(vowel_regex)
-    vowel_pos = []
-    for match in p.finditer(syllable):
-        vowel_pos.append(match.start())
-
-    assert (len(vowel_pos) < 3), "There must only be one or two vowel phonemes in a single " \
-                                 "syllable. "
-    assert (len(vowel_pos) > 0), "There must only be one or two vowel phonemes in a single " \
-                                 "syllable. "
-    if len(vowel_pos) == 1:
-        cut_points = [vowel_pos[0], vowel_pos[0] + 1]
-    else:
-        cut_points = [vowel_pos[0], vowel_pos[1] + 1]
-    # Split into positions
-    onset = syllable[0:cut_points[0]]
-    nucleus = syllable[cut_points[0]:cut_points[1]]
-    coda = syllable[cut_points[1]:len(syllable)]
-
-    if len(onset) == 0:
-        onset = "0"
-    if len(coda) == 0:
-        coda = "0"
-    return [onset, nucleus, coda]
-
-
-def _get_frequency_of_configurations_in_syllable(lexicon, seg_list, syllable_number, get_final_syllables):
-    """
-    Gets the frequency of each segment in seg_list for each phonotactic position in the syllable number for each word
-    in the lexicon. If syllable_number == 1, the frequency of all the segments in seg_list are retrieved for
-    the onset, nucleus, and coda of the first syllable in every lexeme.
-    if get_final_syllables is set to true, this ovverrides the syllable_number variable and simply pulls the final
-    syllable in each word. The resulting dictionary assigns the onset of these syllables to the corresponding number
-    (e.g. if a word is three syllables long, onset_2 will receive the the onset. This results in a dictionary which does
-    not correspond to a single row.
-    """
-
-    if get_final_syllables is False:
-
-        output_dict = {'syllable': [str(syllable_number) + "_onset",
-                                    str(syllable_number) + "_nucleus",
-                                    str(syllable_number) + "_coda"]}
-        onset = []
-        nucleus = []
-        coda = []
-
-        for lexeme in lexicon:
-            lex_split = lexeme.split('.')
-            if syllable_number < len(lex_split):
-                # special behaviour if it is the final syllable. Only take onset!
-                if syllable_number == len(lex_split) - 1:
-                    lex_syl = _split_syllable_into_phonotactic_positions(lex_split[syllable_number])
-                    onset.append(lex_syl[0])
-                else:
-                    lex_syl = _split_syllable_into_phonotactic_positions(lex_split[syllable_number])
-
-                    onset.append(lex_syl[0])
-                    nucleus.append(lex_syl[1])
-                    coda.append(lex_syl[2])
-        for seg in seg_list:
-            in_list = [_get_frequency_of_segment_in_list(seg, onset),
-                       _get_frequency_of_segment_in_list(seg, nucleus),
-                       _get_frequency_of_segment_in_list(seg, coda)]
-            output_dict[seg] = in_list
-        return output_dict
-    # final syllable behaviour. This ignores the onset and only takes final nucleus and coda (coda is always empty)
-    else:
-        output_dict = {'syllable': ["final_nucleus",
-                                    "final_coda"]}
-
-        nucleus = []
-        coda = []
-
-        for lexeme in lexicon:
-            lex_split = lexeme.split(".")
-            lex_syl = _split_syllable_into_phonotactic_positions(lex_split[len(lex_split) - 1])
-
-            nucleus.append(lex_syl[1])
-            coda.append(lex_syl[2])
-
-        # for each set of nucleus and coda, get the frequency of each configuration. Coda is expected to only
-        # have 0, and this feature can be used for debugging of this function.
-        for seg in seg_list:
-            in_list = [_get_frequency_of_segment_in_list(seg, nucleus),
-                       _get_frequency_of_segment_in_list(seg, coda)]
-            output_dict[seg] = in_list
-        return output_dict
-
-
 def _get_phonotactic_entropy(k_row):
     """
     Calculate entropy of a position by summing the probability * positive log probability value of each possible
@@ -215,51 +97,122 @@ def _get_phonotactic_surprisal(fq_row):
     return surprisal_row
 
 
-def _get_surprisal_of_syllable(syl, num, word_len, sur_dict_list):
+def _get_surprisal_of_syllable(syl, num, word_len, sur_index):
+    """
+    Sums the surprisals of the onset, nucleus and coda of a syllable, looked up in the output of get_surprisal_index.
+    Positions with no row in the index contribute 0.
+    """
     surprisal_in_positions = [0] * 3
-    syl_poss = _split_syllable_into_phonotactic_positions(syl)
-    for k_row in sur_dict_list:
-        # special behaviour if final syllable
-        if num == word_len - 1:
-            if k_row["syllable"] == str(num) + "_onset":
-                surprisal_in_positions[0] = float(k_row[syl_poss[0]])
-            elif k_row["syllable"] == "final_nucleus":
-                surprisal_in_positions[1] = float(k_row[syl_poss[1]])
-            elif k_row["syllable"] == "final_coda":
-                # final coda will always be 0, and is factored out of calculation
-                surprisal_in_positions[2] = float(k_row[syl_poss[2]])
-        else:
-            if k_row["syllable"] == str(num) + "_onset":
-                surprisal_in_positions[0] = float(k_row[syl_poss[0]])
-            elif k_row["syllable"] == str(num) + "_nucleus":
-                surprisal_in_positions[1] = float(k_row[syl_poss[1]])
-            elif k_row["syllable"] == str(num) + "_coda":
-                surprisal_in_positions[2] = float(k_row[syl_poss[2]])
+    syl_poss = split_syllable(syl)
+    # special behaviour if final syllable
+    if num == word_len - 1:
+        labels = [str(num) + "_onset", "final_nucleus", "final_coda"]
+    else:
+        labels = [str(num) + "_onset", str(num) + "_nucleus", str(num) + "_coda"]
+    for i, label in enumerate(labels):
+        # final coda will always be 0, and is factored out of calculation
+        if label in sur_index:
+            surprisal_in_positions[i] = sur_index[label][syl_poss[i]]
 
     return sum(surprisal_in_positions)
 
 
+def _get_held_out_surprisal(count, row_sum):
+    """
+    Gets the surprisal of a configuration in a position after one occurrence of it has been removed from the position,
+    in the same way as _get_phonotactic_surprisal. If the configuration no longer occurs in the position, -1 is
+    returned.
+    """
+    if row_sum - 1 == 0 or count - 1 == 0:
+        return -1
+    return log((count - 1) / (row_sum - 1), 2) * -1
+
+
 ##########################################
 # Public Functions
 ##########################################
+def get_word_positions(lex_split):
+    """
+    Takes a lexeme split into its syllables, and returns a list of (position label, configuration) pairs for every
+    phonotactic position in the word. The onset of the final syllable is assigned to its syllable number, while its
+    nucleus and coda are assigned to final_nucleus and final_coda.
+    """
+    positions = []
+    final_syl = len(lex_split) - 1
+    for syl_num, syl in enumerate(lex_split):
+        onset, nucleus, coda = split_syllable(syl)
+        positions.append((str(syl_num) + "_onset", onset))
+        if syl_num == final_syl:
+            positions.append(("final_nucleus", nucleus))
+            positions.append(("final_coda", coda))
+        else:
+            positions.append((str(syl_num) + "_nucleus", nucleus))
+            positions.append((str(syl_num) + "_coda", coda))
+    return positions
+
+
+def get_position_labels(max_syl):
+    """
+    Returns the row labels of the frequency table for a lexicon whose longest word has max_syl syllables.
+    """
+    labels = []
+    for syl_num in range(0, max_syl):
+        labels.extend([str(syl_num) + "_onset", str(syl_num) + "_nucleus", str(syl_num) + "_coda"])
+    labels.extend(["final_nucleus", "final_coda"])
+    return labels
+
+
+def iter_word_positions(lexicon):
+    """
+    Yields each lexeme of the lexicon with the output of get_word_positions for it. A lexicon with its own
+    iter_word_positions method (e.g. an EncodedLexicon) provides them.
+    """
+    if hasattr(lexicon, "iter_word_positions"):
+        yield from lexicon.iter_word_positions()
+        return
+    for lexeme in lexicon:
+        yield lexeme, get_word_positions(lexeme.split("."))
+
+
+def get_positional_counts(lexicon):
+    """
+    Reads the syllabified lexicon once, and counts every (position label, configuration) pair in it. Returns the counts
+    and the length of the longest word in the lexicon (in terms of syllables). A lexicon with its own
+    get_positional_counts method (e.g. an EncodedLexicon) counts itself.
+    """
+    if hasattr(lexicon, "get_positional_counts"):
+        return lexicon.get_positional_counts()
+    counts = Counter()
+    max_syl = 0
+    for lexeme in lexicon:
+        lex_split = lexeme.split(".")
+        if len(lex_split) > max_syl:
+            max_syl = len(lex_split)
+        counts.update(get_word_positions(lex_split))
+    return counts, max_syl
+
+
+def get_frequency_rows_from_counts(counts, max_syl, config_list):
+    """
+    Converts the output of get_positional_counts into one row per phonotactic position, with the frequency of each
+    configuration in config_list.
+    """
+    output_dict_list = []
+    for label in get_position_labels(max_syl):
+        row = {"syllable": label}
+        for config in config_list:
+            row[config] = counts[(label, config)]
+        output_dict_list.append(row)
+    return output_dict_list
+
 
 def get_frequency_of_each_config_in_word_position(lexicon, config_list):
     """
     For the input syllabified lexicon and list of segmental configurations, this function counts the occurrences
     of these segments according to phonotactic positions.
     """
-    new_dict = None
-    for syl_num in range(0, _get_max_syl_count(lexicon)):
-        seg_dict = _get_frequency_of_configurations_in_syllable(lexicon, config_list, syl_num, False)
-        if syl_num > 0:
-            new_dict = _update_dict(new_dict, seg_dict)
-        else:
-            new_dict = seg_dict
-    # assign final syllable
-    final_dict = _get_frequency_of_configurations_in_syllable(lexicon, config_list, -1, True)
-    new_dict = _update_dict(new_dict, final_dict)
-    output_dict_list = [dict(zip(new_dict, t)) for t in zip(*new_dict.values())]
-    return output_dict_list
+    counts, max_syl = get_positional_counts(lexicon)
+    return get_frequency_rows_from_counts(counts, max_syl, config_list)
 
 
 def get_phontactic_entropies(fq_dict):
@@ -273,19 +226,42 @@ def get_phontactic_entropies(fq_dict):
     return entropys
 
 
+def get_surprisal_index(sur_dict_list):
+    """
+    Builds a lookup table from the output of get_phonotactic_surprisals, keyed by position label and then configuration,
+    with float surprisals. This also accepts positional_surprisals.csv as read by lex_io.read_csv, where every value is a
+    string.
+    """
+    sur_index = {}
+    for k_row in sur_dict_list:
+        sur_row = {}
+        for key, value in k_row.items():
+            if key != "syllable":
+                sur_row[key] = float(value)
+        sur_index[k_row["syllable"]] = sur_row
+    return sur_index
+
+
 def get_surprisals_of_lexicon(syl_lex, sur_dict_list):
     """
     Produces the mean surprisal value for each lexeme in syl_lex.
-    syl_lex: Syllabified lexicon
-    sur_dict_list: output from get_phonotactic_surprisals.
+    syl_lex: Syllabified lexicon, as a list of lexemes, or a lexicon with its own get_surprisals method (e.g. an
+    EncodedLexicon), which scores itself.
+    sur_dict_list: output from get_phonotactic_surprisals, or a lookup table built by get_surprisal_index.
     """
+    if isinstance(sur_dict_list, dict):
+        sur_index = sur_dict_list
+    else:
+        sur_index = get_surprisal_index(sur_dict_list)
+    if hasattr(syl_lex, "get_surprisals"):
+        return syl_lex.get_surprisals(sur_index)
     out_dict_list = []
     for lexeme in syl_lex:
         lex_sylab = lexeme.split(".")
         surprisal_value = 0
         out_dict = {}
         for i, syl in enumerate(lex_sylab):
-            surprisal_value = surprisal_value + _get_surprisal_of_syllable(syl, i, len(lex_sylab), sur_dict_list)
+            surprisal_value = surprisal_value + _get_surprisal_of_syllable(syl, i, len(lex_sylab), sur_index)
         out_dict["lexeme"] = lexeme
         out_dict["mean_surprisal"] = surprisal_value / (
                 (len(lex_sylab) * 3) - 1)  # three phonotactic positions for each
@@ -304,3 +280,55 @@ def get_phonotactic_surprisals(fq_dict):
     for row in fq_dict:
         surprisal_dict.append(_get_phonotactic_surprisal(row))
     return surprisal_dict
+
+
+def get_leave_one_out_surprisals_of_lexicon(syl_lex, fq_dict):
+    """
+    Produces the mean surprisal value for each lexeme in syl_lex, against a model built from every other lexeme.
+    syl_lex: Syllabified lexicon, as a list of lexemes, or a lexicon with its own get_leave_one_out_surprisals method
+    (e.g. an EncodedLexicon), which scores itself.
+    fq_dict: output from get_frequency_of_each_config_in_word_position for syl_lex.
+    Rather than rebuilding the frequencies for each lexeme, the lexeme's own occurrence is subtracted from the count and
+    row total of each of its positions while it is scored. If a configuration of the lexeme occurs nowhere else in its
+    position, its surprisal is undefined: the position is counted in unseen_positions, and the mean surprisal of the
+    lexeme is -1.
+    """
+    if hasattr(syl_lex, "get_leave_one_out_surprisals"):
+        return syl_lex.get_leave_one_out_surprisals(fq_dict)
+    fq_index = {}
+    row_sums = {}
+    for fq_row in fq_dict:
+        counts = {}
+        row_sum = 0
+        for key, value in fq_row.items():
+            if key != "syllable":
+                counts[key] = int(value)
+                row_sum = row_sum + counts[key]
+        fq_index[fq_row["syllable"]] = counts
+        row_sums[fq_row["syllable"]] = row_sum
+
+    out_dict_list = []
+    for lexeme in syl_lex:
+        lex_sylab = lexeme.split(".")
+        positions = get_word_positions(lex_sylab)
+        surprisal_value = 0
+        unseen = 0
+        # positions come in threes (onset, nucleus, coda) for each syllable
+        for syl_start in range(0, len(positions), 3):
+            surprisal_in_positions = [0] * 3
+            for i, (label, config) in enumerate(positions[syl_start:syl_start + 3]):
+                if label in fq_index:
+                    surprisal = _get_held_out_surprisal(fq_index[label][config], row_sums[label])
+                    if surprisal == -1:
+                        unseen = unseen + 1
+                    else:
+                        surprisal_in_positions[i] = surprisal
+            surprisal_value = surprisal_value + sum(surprisal_in_positions)
+        out_dict = {"lexeme": lexeme}
+        if unseen > 0:
+            out_dict["mean_surprisal"] = -1
+        else:
+            out_dict["mean_surprisal"] = surprisal_value / ((len(lex_sylab) * 3) - 1)
+        out_dict["unseen_positions"] = unseen
+        out_dict_list.append(out_dict)
+    return out_dict_list
@@ -0,0 +1,197 @@
+"""
+NAME: instrumentation.py
+CREATED: 18-OCT-26
+LAST EDIT: 18-OCT-26
+CREATOR: Author
+EMAIL:  62926253+kroot-kaytetye@users.noreply.github.com
+PROJECT: kroot
+SUMMARY: Per-stage instrumentation for pipeline.py. A RunReport records the wall time (time.perf_counter), CPU time
+        (time.process_time) and peak memory of each stage, together with counters set by the stage, such as the number
+        of lexemes read or of distinct syllables parsed. The report is saved as run_report.json in py_outputs.
+        Peak memory is the peak resident memory of the process during the stage (peak_rss_bytes): on Linux, the peak
+        (VmHWM in /proc/self/status) is reset when the stage starts, by writing 5 to /proc/self/clear_refs. Where it
+        cannot be reset (Windows, macOS), the peak memory allocated by Python during the stage is measured with
+        tracemalloc instead (peak_traced_bytes).
+        With trace set, the hot functions of info_theory_functions.py, orth_to_ipa.py and rule_compiler.py
+        (HOT_FUNCTIONS) are wrapped so that the number of calls to each and their total time are recorded, for each
+        stage and for the whole run. The functions are restored when the report is closed, so there is no overhead in
+        runs without trace. Times of functions which call each other include each other, and calls made in worker
+        processes are not recorded.
+        With profile_stage, one stage is run under cProfile and its statistics are dumped to <stage>.prof, which can
+        be read with pstats or snakeviz.
+FUNCTIONS:
+    _wrap_function
+    _reset_peak_rss
+    _get_peak_rss
+CLASSES:
+    RunReport
+"""
+import cProfile
+from contextlib import contextmanager
+import datetime
+from functools import wraps
+import importlib
+import json
+import platform
+import time
+import tracemalloc
+
+REPORT_NAME = "run_report"
+# Linux only: writing 5 to CLEAR_REFS_PATH resets the peak resident memory, which is read from STATUS_PATH
+CLEAR_REFS_PATH = "/proc/self/clear_refs"
+STATUS_PATH = "/proc/self/status"
+# peak resident memory of each open stage, of any RunReport, from before a stage inside it reset the peak
+_open_peaks = []
+# module -> functions timed while tracing. Each function is looked up in its module at call time, so calls made
+# inside the module are timed too.
+HOT_FUNCTIONS = {"info_theory_functions": ["get_positional_counts", "get_frequency_rows_from_counts",
+                                           "get_phontactic_entropies", "get_phonotactic_surprisals",
+                                           "get_surprisal_index", "get_surprisals_of_lexicon",
+                                           "get_leave_one_out_surprisals_of_lexicon"],
+                 "orth_to_ipa": ["convert_words", "write_outputs"], "rule_compiler": ["convert_word"]}
+
+
+##########################################
+# Private Functions
+##########################################
+def _wrap_function(function, timings):
+    """
+    Returns a function which calls function, and adds the call and its duration to timings.
+    """
+    @wraps(function)
+    def timed_function(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            timings["calls"] = timings["calls"] + 1
+            timings["seconds"] = timings["seconds"] + time.perf_counter() - start
+    return timed_function
+
+
+def _reset_peak_rss():
+    """
+    Resets the peak resident memory of this process to its current resident memory. Returns False if it cannot be
+    reset on this platform.
+    """
+    try:
+        with open(CLEAR_REFS_PATH, "w") as f:
+            f.write("5")
+    except OSError:
+        return False
+    return True
+
+
+def _get_peak_rss():
+    """
+    Returns the peak resident memory of this process since it was last reset, in bytes.
+    """
+    with open(STATUS_PATH) as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                # e.g. "VmHWM:\t    8752 kB"
+                return int(line.split()[1]) * 1024
+    return None
+
+
+class RunReport:
+    """
+    stages: one dictionary per stage, in the order in which they were run. functions: "module.function" -> number of
+    calls and total seconds in the whole run, while tracing.
+    """
+
+    def __init__(self, trace=False, profile_stage=None):
+        self.trace = trace
+        self.profile_stage = profile_stage
+        self.stages = []
+        self.functions = {}
+        self.created = datetime.datetime.now().isoformat(timespec="seconds")
+        self._start = time.perf_counter()
+        # (module, name, original function) of each wrapped function
+        self._wrapped = []
+        if trace:
+            for module_name, names in HOT_FUNCTIONS.items():
+                module = importlib.import_module(module_name)
+                for name in names:
+                    timings = {"calls": 0, "seconds": 0.0}
+                    self.functions[module_name + "." + name] = timings
+                    original = getattr(module, name)
+                    self._wrapped.append((module, name, original))
+                    setattr(module, name, _wrap_function(original, timings))
+
+    def close(self):
+        """
+        Restores the functions wrapped while tracing.
+        """
+        for module, name, original in self._wrapped:
+            setattr(module, name, original)
+        self._wrapped = []
+
+    @contextmanager
+    def stage(self, name, profile_dir=None):
+        """
+        Measures the stage run in the with block, and yields a dictionary in which the stage can set its counters. If
+        this is the profiled stage, its statistics are written to profile_dir.
+        """
+        record = {"stage": name, "skipped": False, "counters": {}}
+        profiler = cProfile.Profile() if name == self.profile_stage else None
+        # a stage run inside another one (e.g. test.py, in the tests stage) resets the peak of the outer stage too, so
+        # the peak of the outer stage so far is kept first
+        if len(_open_peaks) > 0:
+            peak_rss = _get_peak_rss()
+            for open_peak in _open_peaks:
+                open_peak["bytes"] = max(open_peak["bytes"], peak_rss)
+        measure_rss = _reset_peak_rss()
+        # a stage run inside another stage measured with tracemalloc leaves it to the outer one
+        start_tracing = not measure_rss and not tracemalloc.is_tracing()
+        if start_tracing:
+            tracemalloc.start()
+        if measure_rss:
+            _open_peaks.append({"bytes": 0})
+        # calls of each hot function before the stage
+        before = {function_name: dict(timings) for function_name, timings in self.functions.items()}
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield record["counters"]
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            record["wall_seconds"] = time.perf_counter() - start_wall
+            record["cpu_seconds"] = time.process_time() - start_cpu
+            if measure_rss:
+                record["peak_rss_bytes"] = max(_open_peaks.pop()["bytes"], _get_peak_rss())
+            else:
+                record["peak_traced_bytes"] = tracemalloc.get_traced_memory()[1]
+                if start_tracing:
+                    tracemalloc.stop()
+            if self.trace:
+                record["functions"] = {function_name: {"calls": timings["calls"] - before[function_name]["calls"],
+                                                       "seconds": timings["seconds"] - before[function_name]["seconds"]}
+                                       for function_name, timings in self.functions.items()
+                                       if timings["calls"] > before[function_name]["calls"]}
+            if profiler is not None and profile_dir is not None:
+                record["profile"] = profile_dir + "\\" + name + ".prof"
+                profiler.dump_stats(record["profile"])
+            self.stages.append(record)
+
+    def skip_stage(self, name, counters=None):
+        """
+        Records a stage which was skipped, e.g. because its cached outputs were reused.
+        """
+        self.stages.append({"stage": name, "skipped": True, "counters": counters or {}})
+
+    def to_dict(self):
+        return {"created": self.created, "python": platform.python_version(), "platform": platform.platform(),
+                "trace": self.trace, "total_wall_seconds": time.perf_counter() - self._start, "stages": self.stages,
+                "functions": {name: timings for name, timings in self.functions.items() if timings["calls"] > 0}}
+
+    def save(self, out_dir):
+        """
+        Writes the report to run_report.json in out_dir, and returns its path.
+        """
+        path = out_dir + "\\" + REPORT_NAME + ".json"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=1)
+        return path
@@ -1,20 +1,45 @@
 """
 NAME: lex_io.py
 CREATED: 10-JAN-20
-LAST EDIT: 23-MAR-20
+LAST EDIT: 18-OCT-26
 CREATOR: Author
 EMAIL:  62926253+kroot-kaytetye@users.noreply.github.com
 PROJECT: kroot
 SUMMARY: Contains function relating to the reading and writing of documents relevant to the information theory analysis
-        of Kaytetye roots.
+        of Kaytetye roots. The positional tables (phonotactic_fqs and positional_surprisals) can also be written
+        together as a sparse long .csv document or a binary columnar .bin document, and read back from either without
+        the rest of the analysis: both list every position.
 FUNCTIONS:
     read_lexicon_file
+    iter_lexicon_chunks
     read_csv
     write_dict_to_csv
+    write_dict_chunks_to_csv
+    _get_sparse_cells
+    _get_rows_from_cells
+    write_positional_table_long
+    write_positional_table_binary
+    read_positional_table
 """
 from pathlib import Path
 import os
 import csv
+from array import array
+import mmap
+import struct
+import sys
+
+# positional tables in long and binary format hold phonotactic_fqs and positional_surprisals together, with one row for
+# each position and configuration with a count greater than 0. A long table lists a position with no counted
+# configuration in a single row with an empty configuration and a count of 0, so that it holds every position
+POSITIONAL_TABLE_NAME = "positional_table"
+LONG_COLUMNS = ["position", "configuration", "count", "surprisal"]
+# binary format: magic, version, number of labels, configurations and rows, then the labels and configurations as
+# newline-separated utf-8 text (each preceded by its length in bytes), padding to 8 bytes, and the columns: surprisal
+# (float64), position id, configuration id and count (int32). Every number is little-endian
+BINARY_MAGIC = b"KRPT"
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct("<4siiii")
 
 
 def read_lexicon_file(directory):
@@ -25,6 +50,22 @@ def read_lexicon_file(directory):
     return lex_array
 
 
+def iter_lexicon_chunks(directory, chunk_size=100000):
+    """
+    Reads a lexicon document in chunks of at most chunk_size lexemes, so that only one chunk is held in memory at a
+    time. Joining the chunks gives the same list as read_lexicon_file.
+    """
+    chunk = []
+    with open(directory, encoding="utf-8") as f:
+        for line in f:
+            chunk.append(line.strip('\n'))
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+    if len(chunk) > 0:
+        yield chunk
+
+
 def read_csv(dir):
     file = open(dir, encoding="utf-8-sig")
     output = csv.DictReader(file)
@@ -36,3 +77,142 @@ def write_dict_to_csv(out_dict, output_name, out_dir):
         w = csv.DictWriter(output, out_dict[0].keys())
         w.writeheader()
         w.writerows(out_dict)
+
+
+def write_dict_chunks_to_csv(dict_chunks, output_name, out_dir):
+    """
+    Writes an iterable of lists of dictionaries to a single .csv document, one list at a time. The header is taken from
+    the first row. The document is the same as write_dict_to_csv would produce for the joined lists.
+    """
+    with open(out_dir + "\\" + output_name + ".csv", 'w', encoding="utf-8", newline='') as output:
+        w = None
+        for out_dict in dict_chunks:
+            if len(out_dict) == 0:
+                continue
+            if w is None:
+                w = csv.DictWriter(output, out_dict[0].keys())
+                w.writeheader()
+            w.writerows(out_dict)
+
+
+def _get_sparse_cells(fq_dict, sur_dict_list):
+    """
+    Yields (position, configuration, count, surprisal) for every cell of the frequency rows with a count greater than 0.
+    """
+    for fq_row, sur_row in zip(fq_dict, sur_dict_list):
+        for config, count in fq_row.items():
+            if config != "syllable" and int(count) > 0:
+                yield fq_row["syllable"], config, int(count), float(sur_row[config])
+
+
+def _get_rows_from_cells(cells, labels, config_list=None):
+    """
+    Rebuilds the output of get_frequency_of_each_config_in_word_position and get_phonotactic_surprisals from sparse
+    cells, with one row for each of labels. If config_list is not given, it is taken from the cells. Cells that are not
+    listed have a count of 0 and a surprisal of -1.
+    """
+    cells = list(cells)
+    if config_list is None:
+        config_list = sorted(set(config for _l, config, _n, _s in cells))
+    fq_dict = [dict([("syllable", label)] + [(config, 0) for config in config_list]) for label in labels]
+    sur_dict_list = [dict([("syllable", label)] + [(config, -1) for config in config_list]) for label in labels]
+    label_rows = {label: i for i, label in enumerate(labels)}
+    for label, config, count, surprisal in cells:
+        fq_dict[label_rows[label]][config] = count
+        sur_dict_list[label_rows[label]][config] = surprisal
+    return fq_dict, sur_dict_list
+
+
+def write_positional_table_long(fq_dict, sur_dict_list, out_dir, output_name=POSITIONAL_TABLE_NAME):
+    """
+    Writes phonotactic_fqs and positional_surprisals as one sparse .csv document with the columns position,
+    configuration, count and surprisal. Cells with a count of 0 are left out, but every position is kept, in order.
+    """
+    with open(out_dir + "\\" + output_name + ".csv", 'w', encoding="utf-8", newline='') as output:
+        w = csv.writer(output)
+        w.writerow(LONG_COLUMNS)
+        for fq_row, sur_row in zip(fq_dict, sur_dict_list):
+            cells = list(_get_sparse_cells([fq_row], [sur_row]))
+            if len(cells) > 0:
+                w.writerows(cells)
+            else:
+                w.writerow([fq_row["syllable"], "", 0, -1])
+
+
+def write_positional_table_binary(fq_dict, sur_dict_list, out_dir, output_name=POSITIONAL_TABLE_NAME):
+    """
+    Writes phonotactic_fqs and positional_surprisals as one sparse binary columnar document (.bin), which
+    read_positional_table can memory-map. Every label and configuration of the rows is kept.
+    """
+    labels = [row["syllable"] for row in fq_dict]
+    configs = [key for key in fq_dict[0].keys() if key != "syllable"] if len(fq_dict) > 0 else []
+    label_ids = {label: i for i, label in enumerate(labels)}
+    config_ids = {config: i for i, config in enumerate(configs)}
+    surprisals = array("d")
+    columns = [array("i"), array("i"), array("i")]
+    for label, config, count, surprisal in _get_sparse_cells(fq_dict, sur_dict_list):
+        surprisals.append(surprisal)
+        columns[0].append(label_ids[label])
+        columns[1].append(config_ids[config])
+        columns[2].append(count)
+    if sys.byteorder == "big":
+        for column in [surprisals] + columns:
+            column.byteswap()
+    label_text = "\n".join(labels).encode("utf-8")
+    config_text = "\n".join(configs).encode("utf-8")
+    with open(out_dir + "\\" + output_name + ".bin", 'wb') as output:
+        output.write(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, len(labels), len(configs), len(surprisals)))
+        for text in [label_text, config_text]:
+            output.write(struct.pack("<i", len(text)))
+            output.write(text)
+        output.write(b"\0" * (-output.tell() % 8))
+        for column in [surprisals] + columns:
+            column.tofile(output)
+
+
+def read_positional_table(path, config_list=None):
+    """
+    Reads a positional table in long (.csv) or binary (.bin) format, and returns the frequency rows and surprisal rows
+    in the same form as get_frequency_of_each_config_in_word_position and get_phonotactic_surprisals, with numeric
+    values. config_list sets the configuration columns of a long table, which are otherwise the sorted configurations
+    with a count.
+    """
+    if not path.endswith(".bin"):
+        with open(path, encoding="utf-8-sig", newline='') as f:
+            rows = list(csv.DictReader(f))
+        # positions are listed in order, including those with no counted configuration
+        labels = list(dict.fromkeys(row["position"] for row in rows))
+        cells = [(row["position"], row["configuration"], int(row["count"]), float(row["surprisal"]))
+                 for row in rows if int(row["count"]) > 0]
+        return _get_rows_from_cells(cells, labels, config_list)
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError("Empty positional table: " + path)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, version, label_count, config_count, row_count = BINARY_HEADER.unpack_from(mm, 0)
+            if magic != BINARY_MAGIC or version != BINARY_VERSION:
+                raise ValueError("Not a version " + str(BINARY_VERSION) + " positional table: " + path)
+            offset = BINARY_HEADER.size
+            texts = []
+            for _ in range(2):
+                length = struct.unpack_from("<i", mm, offset)[0]
+                texts.append(mm[offset + 4:offset + 4 + length].decode("utf-8"))
+                offset = offset + 4 + length
+            offset = offset + (-offset % 8)
+            labels = texts[0].split("\n") if label_count > 0 else []
+            configs = texts[1].split("\n") if config_count > 0 else []
+            surprisals = array("d")
+            surprisals.frombytes(mm[offset:offset + 8 * row_count])
+            offset = offset + 8 * row_count
+            columns = []
+            for _ in range(3):
+                column = array("i")
+                column.frombytes(mm[offset:offset + 4 * row_count])
+                columns.append(column)
+                offset = offset + 4 * row_count
+    if sys.byteorder == "big":
+        for column in [surprisals] + columns:
+            column.byteswap()
+    cells = ((labels[label_id], configs[config_id], count, surprisal)
+             for surprisal, label_id, config_id, count in zip(surprisals, *columns))
+    return _get_rows_from_cells(cells, labels, configs)
@@ -1,7 +1,7 @@
 """
 NAME: orth_to_ipa.py
 CREATED: 22-MAR-20
-LAST EDIT: 22-MAR-20
+LAST EDIT: 18-OCT-26
 CREATOR: Author
 EMAIL:  62926253+kroot-kaytetye@users.noreply.github.comF
 PROJECT: kroot
@@ -9,44 +9,86 @@ SUMMARY: Receives an input document with a 'words' column of tokens in Kaytetye
         orth_to_ipa rules. Using these, it produces an updated lexicon document with tokens converted to ipa, with
         and without syllabification. It also produces .txt documents listing these transformations:
         phon.txt and phon_syls.txt.
+        The rules are compiled once by rule_compiler.py, which fuses runs of literal rules into single passes, and each
+        distinct orthographic form is only converted once, with rule_compiler.convert_word. With --workers, the distinct
+        forms are split into chunks and converted across a pool of processes.
+FUNCTIONS:
+    _convert_chunk
+    convert_words
+    write_outputs
 """
 import pandas as ps
-import re
-import sys
 import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+import rule_compiler
 
-in_path = sys.argv[1]
-rules_path = sys.argv[2]
-out_dir = os.path.dirname(in_path) + "\\py_outputs"
-Path(out_dir).mkdir(parents=True, exist_ok=True)
-
-in_doc = ps.read_csv(in_path, keep_default_na=False)  # read in target doc
-rules = ps.read_csv(rules_path, keep_default_na=False)  # read in rule doc
-# get phonological rules
-phon_rules = rules.loc[rules['type'] == 'phon']
-syl_rules = rules.loc[rules['type'] == 'syl']
-# for each item 'word' column in the in_doc, convert to phon
-phons = []
-phon_syls = []
-for _index, row in in_doc.iterrows():
-    in_phon = row['words']
-    for _rule_index, rule_row in phon_rules.iterrows():
-        in_phon = re.sub(rule_row['original'], rule_row['result'], in_phon)
-    phons.append(in_phon)
-    # create syllabified form with in_syl
-    for _syl_index, syl_row in syl_rules.iterrows():
-        pattern = re.compile(syl_row['original'])
-        in_phon = pattern.sub(syl_row['result'], in_phon)
-    phon_syls.append(in_phon)
-# output .csv
-out_doc = in_doc
-out_doc['phon'] = phons
-out_doc['phon_syl'] = phon_syls
-out_doc.to_csv(out_dir + "\\output.csv", encoding="utf-8")
-
-# output txt documents
-with open(out_dir + "\\phon.txt", 'w', encoding="utf-8") as f:
-    f.write('\n'.join(phons))
-with open(out_dir + "\\phon_syls.txt", 'w', encoding="utf-8") as f:
-    f.write('\n'.join(phon_syls))
+
+##########################################
+# Private Functions
+##########################################
+def _convert_chunk(words, compiled_rules):
+    """
+    Converts a list of orthographic forms. This is the unit of work sent to each process in convert_words.
+    """
+    return [rule_compiler.convert_word(word, compiled_rules) for word in words]
+
+
+##########################################
+# Public Functions
+##########################################
+def convert_words(words, compiled_rules, workers=1, chunk_size=10000):
+    """
+    Converts a list of orthographic forms, and returns a list of ipa forms and a list of syllabified ipa forms in the
+    same order. Each distinct form is converted once. If workers is greater than 1 and there is more than one chunk of
+    distinct forms, the chunks are converted in a pool of worker processes.
+    """
+    unique_words = list(dict.fromkeys(words))
+    if workers > 1 and len(unique_words) > chunk_size:
+        chunks = [unique_words[i:i + chunk_size] for i in range(0, len(unique_words), chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunk_results = executor.map(_convert_chunk, chunks, [compiled_rules] * len(chunks))
+            results = [conversion for chunk_result in chunk_results for conversion in chunk_result]
+    else:
+        results = _convert_chunk(unique_words, compiled_rules)
+    conversions = dict(zip(unique_words, results))
+    phons = [conversions[word][0] for word in words]
+    phon_syls = [conversions[word][1] for word in words]
+    return phons, phon_syls
+
+
+def write_outputs(in_doc, phons, phon_syls, out_dir):
+    """
+    Writes output.csv, phon.txt and phon_syls.txt to out_dir.
+    """
+    # output .csv
+    out_doc = in_doc
+    out_doc['phon'] = phons
+    out_doc['phon_syl'] = phon_syls
+    out_doc.to_csv(out_dir + "\\output.csv", encoding="utf-8")
+
+    # output txt documents
+    with open(out_dir + "\\phon.txt", 'w', encoding="utf-8") as f:
+        f.write('\n'.join(phons))
+    with open(out_dir + "\\phon_syls.txt", 'w', encoding="utf-8") as f:
+        f.write('\n'.join(phon_syls))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("in_path")
+    parser.add_argument("rules_path")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    out_dir = os.path.dirname(args.in_path) + "\\py_outputs"
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+
+    in_doc = ps.read_csv(args.in_path, keep_default_na=False)  # read in target doc
+    # compile rule doc, reusing the cached analysis in out_dir if rules.csv has not changed
+    compiled_rules, _plan = rule_compiler.compile_rule_file(args.rules_path, out_dir)
+    # for each item 'word' column in the in_doc, convert to phon
+    phons, phon_syls = convert_words(list(in_doc['words']), compiled_rules, args.workers, args.chunk_size)
+    write_outputs(in_doc, phons, phon_syls, out_dir)
@@ -0,0 +1,329 @@
+"""
+NAME: pipeline.py
+CREATED: 18-OCT-26
+LAST EDIT: 18-OCT-26
+CREATOR: Author
+EMAIL:  62926253+kroot-kaytetye@users.noreply.github.com
+PROJECT: kroot
+SUMMARY: Runs every stage of the kroot analysis in a single Python process: test.py, orth_to_ipa.py,
+        produce_segmental_configurations_list.py, produce_info_theory_docs.py and summary_tables.py. Each stage passes
+        its output to the next one in memory. The intermediate documents (output.csv, phon.txt, phon_syls.txt and
+        phon_configs.txt) are still written by default, and can be skipped with --no-intermediate. Called by main.rs.
+        The summary tables are written to r_tables, next to py_outputs, for produce_entropy_plots.r to plot. Use
+        --no-summary-tables to skip them.
+        Stages whose inputs, parameters and code are unchanged since the last run are skipped, and their documents in
+        py_outputs are reused (see stage_cache.py). Use --no-cache to run every stage. The cache relies on the
+        intermediate documents, so it is not used with --no-intermediate.
+        With --group-by, each group of one or more columns of kroot.csv (e.g. pos) is also analysed, in the same run
+        (see produce_info_theory_docs.py).
+        The wall time, CPU time and counters of each stage are written to run_report.json in py_outputs (see
+        instrumentation.py), with the peak memory of each stage. With --trace, the report also has the time spent in the
+        hot functions of info_theory_functions.py, orth_to_ipa.py and rule_compiler.py. With --profile, one stage is
+        run under cProfile.
+        Before the analysis, the syllabified lexicon is checked in a single pass (see validate_lexicon.py), and the run
+        stops with every malformed lexeme listed. With --quarantine, they are written to quarantined_lexemes.csv in
+        py_outputs instead, and the rest of the lexicon is analysed.
+        At the end, the hit rate of the syllable parser's memo (see syllable_parser.py) is printed.
+EXAMPLE CALL: python pipeline.py C:\\docs\\kroot_docs
+FUNCTIONS:
+    _get_stage_key
+    _is_stage_fresh
+    _record_stage
+    _get_groups
+    _count_syllables
+    _run_stages
+    _run_info_theory_stage
+    run_tests
+    run_orth_to_ipa
+    run_configurations
+    run_info_theory_docs
+    run_summary_tables
+    run_pipeline
+"""
+import argparse
+import os
+import runpy
+from pathlib import Path
+import pandas as ps
+import instrumentation
+import lex_io
+import orth_to_ipa
+import rule_compiler
+import produce_segmental_configurations_list as pscl
+import produce_info_theory_docs as pitd
+import stage_cache
+import summary_tables
+import syllable_parser
+import validate_lexicon
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+# scripts whose code each cached stage depends on
+STAGE_CODE = {"orth_to_ipa": ["orth_to_ipa.py", "rule_compiler.py", "lex_io.py"],
+              "configurations": ["produce_segmental_configurations_list.py", "get_configurations.py",
+                                 "syllable_parser.py", "validate_lexicon.py"],
+              "info_theory_docs": ["produce_info_theory_docs.py", "info_theory_functions.py", "info_theory_arrays.py",
+                                   "encoded_lexicon.py", "syllable_parser.py", "count_state.py", "sharded_analysis.py",
+                                   "lex_io.py", "validate_lexicon.py"],
+              "summary_tables": ["summary_tables.py"]}
+
+
+##########################################
+# Private Functions
+##########################################
+def _get_stage_key(manifest, stage, input_paths, params):
+    """
+    Returns the cache key of a stage, or None if the cache is not in use.
+    """
+    if manifest is None:
+        return None
+    code_paths = [os.path.join(SCRIPT_DIR, name) for name in STAGE_CODE[stage]]
+    return stage_cache.get_stage_key(input_paths, params, code_paths)
+
+
+def _is_stage_fresh(manifest, stage, key):
+    if manifest is None:
+        return False
+    if stage_cache.is_stage_fresh(manifest, stage, key):
+        print("Skipping " + stage + ": inputs are unchanged since the last run.")
+        return True
+    return False
+
+
+def _record_stage(manifest, stage, key, output_paths, out_dir):
+    if manifest is not None:
+        stage_cache.record_stage(manifest, stage, key, output_paths)
+        stage_cache.save_manifest(out_dir, manifest)
+
+
+def _get_groups(in_doc, group_by, out_dir):
+    """
+    Returns the group of each lexeme in the columns of group_by, taken from the input document, or read from output.csv
+    if the ipa conversion was skipped.
+    """
+    if in_doc is None:
+        return pitd.read_groups(out_dir + "\\output.csv", group_by)
+    missing = [column for column in group_by if column not in in_doc.columns]
+    if len(missing) > 0:
+        raise ValueError("Grouping columns not found in kroot.csv: " + ", ".join(missing))
+    return {column: [str(group) for group in in_doc[column]] for column in group_by}
+
+
+def _count_syllables(counters, cache_before):
+    """
+    Adds the number of syllables split by the parser during a stage, and the number read from its memo, to the
+    counters of the stage.
+    """
+    cache_after = syllable_parser.get_cache_stats()
+    counters["syllables_parsed"] = cache_after["misses"] - cache_before["misses"]
+    counters["syllable_memo_hits"] = cache_after["hits"] - cache_before["hits"]
+
+
+def _run_stages(data_dir, out_dir, write_intermediate, tests, workers, backend, use_cache, table_format, group_by,
+                produce_tables, quarantine, report):
+    """
+    Runs the stages of run_pipeline, recording each of them in the RunReport.
+    """
+    if tests:
+        with report.stage("tests", out_dir):
+            run_tests()
+    # the cache reuses the intermediate documents, so it can only be used when they are written
+    manifest = stage_cache.load_manifest(out_dir) if use_cache and write_intermediate else None
+    in_path = os.path.join(data_dir, "kroot.csv")
+    rules_path = os.path.join(data_dir, "rules.csv")
+    phon_syls_path = out_dir + "\\phon_syls.txt"
+    configs_path = out_dir + "\\phon_configs.txt"
+
+    key = _get_stage_key(manifest, "orth_to_ipa", [in_path, rules_path], {})
+    in_doc = None
+    if _is_stage_fresh(manifest, "orth_to_ipa", key):
+        phon_syls = lex_io.read_lexicon_file(phon_syls_path)
+        report.skip_stage("orth_to_ipa", {"lexemes": len(phon_syls)})
+    else:
+        with report.stage("orth_to_ipa", out_dir) as counters:
+            in_doc, phon_syls = run_orth_to_ipa(in_path, rules_path, out_dir, write_intermediate, workers, counters)
+        _record_stage(manifest, "orth_to_ipa", key, [out_dir + "\\output.csv", out_dir + "\\phon.txt", phon_syls_path],
+                      out_dir)
+
+    # the lexicon is checked on every run, as it is cheap and the later stages rely on it. Without quarantine, a
+    # malformed lexeme stops the run, so the outputs of the later stages only depend on phon_syls.txt
+    with report.stage("validation", out_dir) as counters:
+        counters["lexemes"] = len(phon_syls)
+        phon_syls, malformed = validate_lexicon.check_lexicon(phon_syls, out_dir, quarantine)
+        counters["malformed_lexemes"] = len(malformed)
+
+    key = _get_stage_key(manifest, "configurations", [phon_syls_path], {})
+    if _is_stage_fresh(manifest, "configurations", key):
+        configs = lex_io.read_lexicon_file(configs_path)
+        report.skip_stage("configurations", {"configurations": len(configs)})
+    else:
+        with report.stage("configurations", out_dir) as counters:
+            cache_before = syllable_parser.get_cache_stats()
+            configs = run_configurations(phon_syls, out_dir, write_intermediate)
+            counters["lexemes"] = len(phon_syls)
+            counters["configurations"] = len(configs)
+            _count_syllables(counters, cache_before)
+        _record_stage(manifest, "configurations", key, [configs_path], out_dir)
+
+    input_paths = [phon_syls_path, configs_path] + ([out_dir + "\\output.csv"] if group_by else [])
+    key = _get_stage_key(manifest, "info_theory_docs", input_paths,
+                         {"backend": backend, "table_format": table_format, "group_by": group_by or []})
+    if _is_stage_fresh(manifest, "info_theory_docs", key):
+        report.skip_stage("info_theory_docs")
+        docs = pitd.read_documents(out_dir, table_format)
+    else:
+        docs = _run_info_theory_stage(phon_syls, configs, in_doc, out_dir, backend, workers, table_format, group_by,
+                                      malformed, manifest, key, report)
+    if not produce_tables:
+        return docs
+
+    tables_dir = os.path.join(data_dir, "r_tables")
+    key = _get_stage_key(manifest, "summary_tables",
+                         [out_dir + "\\lexical_surprisals.csv", out_dir + "\\phonological_entropy.csv"], {})
+    if _is_stage_fresh(manifest, "summary_tables", key):
+        report.skip_stage("summary_tables")
+    else:
+        with report.stage("summary_tables", out_dir) as counters:
+            tables = run_summary_tables(docs, tables_dir)
+            counters["lexemes"] = len(tables["lexemes_by_category"])
+            counters["categories"] = len(tables["surprisal_categories"])
+        _record_stage(manifest, "summary_tables", key,
+                      [tables_dir + "\\" + name + ".csv" for name in summary_tables.TABLE_NAMES], out_dir)
+    return docs
+
+
+def _run_info_theory_stage(phon_syls, configs, in_doc, out_dir, backend, workers, table_format, group_by, malformed,
+                           manifest, key, report):
+    """
+    Runs the info_theory_docs stage of _run_stages, and records it in the cache manifest. The groups of the quarantined
+    lexemes in malformed are left out, so that the groups match the lexemes of phon_syls.
+    """
+    with report.stage("info_theory_docs", out_dir) as counters:
+        cache_before = syllable_parser.get_cache_stats()
+        groups = None
+        if group_by:
+            groups = {column: validate_lexicon.get_clean_lexicon(column_groups, malformed)
+                      for column, column_groups in _get_groups(in_doc, group_by, out_dir).items()}
+        docs = run_info_theory_docs(phon_syls, configs, out_dir, backend, workers, table_format, groups)
+        counters["lexemes"] = len(phon_syls)
+        # every syllable has an onset, a nucleus and a coda position
+        counters["positions"] = 3 * sum(lexeme.count(".") + 1 for lexeme in phon_syls)
+        counters["position_labels"] = len(docs["phonological_entropy"])
+        counters["configurations"] = len(configs)
+        if "groups" in docs:
+            counters["groups"] = len(docs["groups"])
+        _count_syllables(counters, cache_before)
+    output_paths = pitd.get_document_paths(out_dir, table_format)
+    if "groups" in docs:
+        group_dir = out_dir + "\\groups"
+        output_paths.append(group_dir + "\\group_index.csv")
+        for column, group in docs["groups"]:
+            output_paths += pitd.get_document_paths(group_dir + "\\" + pitd.get_group_name(column, group), table_format)
+    _record_stage(manifest, "info_theory_docs", key, output_paths, out_dir)
+    return docs
+
+
+##########################################
+# Public Functions
+##########################################
+def run_tests():
+    """
+    Runs test.py in this process. An AssertionError stops the pipeline.
+    """
+    runpy.run_path(os.path.join(SCRIPT_DIR, "test.py"), run_name="__main__")
+
+
+def run_orth_to_ipa(in_path, rules_path, out_dir, write_intermediate=True, workers=1, counters=None):
+    """
+    Converts the 'words' column of kroot.csv to ipa. Returns the input document and the syllabified ipa forms. If a
+    counters dictionary is given, the numbers of lexemes, distinct forms, rules and compiled passes are added to it.
+    """
+    in_doc = ps.read_csv(in_path, keep_default_na=False)
+    compiled_rules, plan = rule_compiler.compile_rule_file(rules_path, out_dir)
+    words = list(in_doc['words'])
+    phons, phon_syls = orth_to_ipa.convert_words(words, compiled_rules, workers)
+    if counters is not None:
+        counters["lexemes"] = len(words)
+        counters["distinct_forms"] = len(set(words))
+        counters["rules"] = sum(len(rule_pass["rules"]) for rule_pass in plan)
+        counters["passes"] = len(plan)
+        # each distinct form is converted once, with every pass
+        counters["pass_applications"] = counters["distinct_forms"] * len(plan)
+    if write_intermediate:
+        orth_to_ipa.write_outputs(in_doc, phons, phon_syls, out_dir)
+    return in_doc, phon_syls
+
+
+def run_configurations(phon_syls, out_dir, write_intermediate=True):
+    """
+    Returns the segmental configurations of the syllabified lexicon.
+    """
+    return list(pscl.produce_configurations(phon_syls, out_dir if write_intermediate else None))
+
+
+def run_info_theory_docs(phon_syls, configs, out_dir, backend="python", workers=1, table_format="wide", groups=None):
+    """
+    Produces the information theory documents. Returns them in a dictionary keyed by document name.
+    """
+    return pitd.produce_info_theory_docs(phon_syls, configs, out_dir, backend, workers, table_format=table_format,
+                                         groups=groups)
+
+
+def run_summary_tables(docs, tables_dir):
+    """
+    Produces the summary tables (see summary_tables.py) from the information theory documents, and writes them to
+    tables_dir. Returns them in a dictionary keyed by document name.
+    """
+    Path(tables_dir).mkdir(parents=True, exist_ok=True)
+    return summary_tables.produce_summary_tables(docs["lexical_surprisals"], docs["phonological_entropy"], tables_dir)
+
+
+def run_pipeline(data_dir, write_intermediate=True, tests=True, workers=1, backend="python", use_cache=True,
+                 table_format="wide", group_by=None, report=None, produce_tables=True, quarantine=False):
+    """
+    Runs every stage for the kroot.csv and rules.csv documents in data_dir, writing the outputs to data_dir\\py_outputs.
+    Returns the information theory documents. If the last stage was skipped, these are read back from py_outputs, so
+    the values of wide tables are strings, and the documents of the groups in group_by (columns of kroot.csv) are only
+    on disk. Each stage is recorded in report (an instrumentation.RunReport, by default one without tracing), which is
+    saved to run_report.json in py_outputs, also if a stage fails. If produce_tables is set, the summary tables are
+    written to data_dir\\r_tables. Malformed lexemes raise a validate_lexicon.LexiconError before the analysis, unless
+    quarantine is set, in which case they are written to quarantined_lexemes.csv and left out.
+    """
+    out_dir = os.path.join(data_dir, "py_outputs")
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    report = instrumentation.RunReport() if report is None else report
+    try:
+        return _run_stages(data_dir, out_dir, write_intermediate, tests, workers, backend, use_cache, table_format,
+                           group_by, produce_tables, quarantine, report)
+    finally:
+        report.close()
+        print("Run report: " + report.save(out_dir))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("data_dir", help="folder which contains kroot.csv and rules.csv")
+    parser.add_argument("--no-intermediate", action="store_true",
+                        help="do not write output.csv, phon.txt, phon_syls.txt and phon_configs.txt")
+    parser.add_argument("--no-tests", action="store_true", help="do not run test.py first")
+    parser.add_argument("--workers", type=int, default=1, help="processes used for the ipa conversion and the analysis")
+    parser.add_argument("--backend", choices=["python", "numpy"], default="python")
+    parser.add_argument("--no-cache", action="store_true", help="run every stage, even if its inputs are unchanged")
+    parser.add_argument("--table-format", choices=pitd.TABLE_FORMATS, default="wide",
+                        help="format of the positional tables (see produce_info_theory_docs.py)")
+    parser.add_argument("--group-by", help="comma-separated columns of kroot.csv, e.g. pos, whose groups are also "
+                                           "analysed separately")
+    parser.add_argument("--trace", action="store_true",
+                        help="also record the number of calls to the hot functions and the time spent in them")
+    parser.add_argument("--profile", choices=["tests", "orth_to_ipa", "validation", "configurations",
+                                              "info_theory_docs", "summary_tables"],
+                        help="run this stage under cProfile, and dump its statistics to <stage>.prof in py_outputs")
+    parser.add_argument("--no-summary-tables", action="store_true", help="do not write the summary tables to r_tables")
+    parser.add_argument("--quarantine", action="store_true",
+                        help="write malformed lexemes to quarantined_lexemes.csv and analyse the rest of the lexicon")
+    args = parser.parse_args()
+    run_pipeline(args.data_dir, not args.no_intermediate, not args.no_tests, args.workers, args.backend,
+                 not args.no_cache, args.table_format, args.group_by.split(",") if args.group_by else None,
+                 instrumentation.RunReport(args.trace, args.profile), not args.no_summary_tables, args.quarantine)
+    cache_stats = syllable_parser.get_cache_stats()
+    print("Syllable cache: " + str(cache_stats["hits"]) + " hits, " + str(cache_stats["misses"]) + " misses (" +
+          format(cache_stats["hit_rate"], ".1%") + " hit rate).")
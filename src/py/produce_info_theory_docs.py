@@ -1,42 +1,303 @@
 """
 NAME: produce_info_theory_docs.py
 CREATED: 16-JAN-20
-LAST EDIT: 23-MAR-20
+LAST EDIT: 18-OCT-26
 CREATOR: Author
 EMAIL:  62926253+kroot-kaytetye@users.noreply.github.com
 PROJECT: Orthography to Surprisals
 SUMMARY: Retrieves the directories of  syllabified roots and a set of all possible segmental configurations as
 command line arguments, and outputs various documents. This script relies on two .py documents:
-lex_io.py, and info_theory_functions.py
+lex_io.py, and info_theory_functions.py. With --backend numpy, entropies and surprisals are calculated with the
+vectorised functions in info_theory_arrays.py instead.
+With --stream, the syllabified roots are read in chunks of --chunk-size lexemes and folded into a CountState
+(count_state.py), so that memory use does not grow with the size of the lexicon. The state can be saved with
+--save-state, and a saved state can be used in place of counting with --load-state.
+With --workers, the lexicon is counted and scored in shards across a pool of processes (sharded_analysis.py). The
+documents are identical to those of a single process. In a single process, the lexicon is first encoded as an
+EncodedLexicon (encoded_lexicon.py), so that it is only split into syllables and positions once.
+With --leave-one-out, lexical_surprisals_loo is also written, in which each lexeme is scored against a model built from
+every other lexeme (see itf.get_leave_one_out_surprisals_of_lexicon).
+With --table-format long or binary, phonotactic_fqs and positional_surprisals are replaced by a single sparse
+positional_table document (.csv or .bin), which lists only the cells with a count (see lex_io.py). The format is
+recorded in table_format.txt, so that readers such as produce_entropy_plots.r do not depend on which documents of
+earlier runs are still in the folder.
+With --group-by, the lexicon is also analysed by group, using one or more columns of output.csv (e.g. pos). The lexicon
+is encoded once and split into groups in the same pass, and each group gets the same documents as the pooled lexicon,
+in a folder groups\\<column>_<value>. The groups are listed in groups\\group_index.csv.
+FUNCTIONS:
+    get_document_paths
+    write_table_format
+    read_documents
+    read_groups
+    get_group_name
+    _produce_positional_docs
+    _produce_lexicon_docs
+    _produce_group_docs
+    produce_info_theory_docs
+    produce_info_theory_docs_streamed
 """
-import sys
+import argparse
 import lex_io
 import info_theory_functions as itf
+from count_state import CountState
+from encoded_lexicon import EncodedLexicon
+import sharded_analysis
+from concurrent.futures import ProcessPoolExecutor
 import os
 from pathlib import Path
+import re
 
-syl_lex_dir = sys.argv[1]
-seg_config_dir = sys.argv[2]
-# create output dir for python analysis documents if it does not exist
-out_dir = os.path.dirname(syl_lex_dir)
-
-syl_lex = lex_io.read_lexicon_file(syl_lex_dir)
-seg_configs = lex_io.read_lexicon_file(seg_config_dir)
-
-# make new phonotactic fqs
-freq_dict = itf.get_frequency_of_each_config_in_word_position(syl_lex, seg_configs)
-# save document
-lex_io.write_dict_to_csv(freq_dict, "phonotactic_fqs", out_dir)
-# calculate entropy for syllable positions
-phon_ent = itf.get_phontactic_entropies(freq_dict)
-lex_io.write_dict_to_csv(phon_ent, "phonological_entropy", out_dir)
-
-# get positional surprisals
-phonol_surprisals = itf.get_phonotactic_surprisals(freq_dict)
-# save phonological surprisals
-lex_io.write_dict_to_csv(phonol_surprisals, "positional_surprisals", out_dir)
-
-# get surprisals of lexicon
-lex_sur = itf.get_surprisals_of_lexicon(syl_lex, phonol_surprisals)
-# save lexicon surprisals
-lex_io.write_dict_to_csv(lex_sur, "lexical_surprisals", out_dir)
\ No newline at end of file
+# documents written by produce_info_theory_docs, without the .csv extension
+DOCUMENT_NAMES = ["phonotactic_fqs", "phonological_entropy", "positional_surprisals", "lexical_surprisals"]
+# formats of the positional tables: wide .csv documents, or a single sparse long .csv or binary .bin document
+TABLE_FORMATS = ["wide", "long", "binary"]
+# document which records the table format of the positional tables in a folder
+TABLE_FORMAT_NAME = "table_format"
+
+
+def get_document_paths(out_dir, table_format="wide"):
+    """
+    Returns the paths of the documents written by produce_info_theory_docs with the given table format.
+    """
+    if table_format == "wide":
+        file_names = [name + ".csv" for name in DOCUMENT_NAMES]
+    else:
+        table_name = lex_io.POSITIONAL_TABLE_NAME + (".bin" if table_format == "binary" else ".csv")
+        file_names = [table_name, "phonological_entropy.csv", "lexical_surprisals.csv"]
+    file_names.append(TABLE_FORMAT_NAME + ".txt")
+    return [out_dir + "\\" + file_name for file_name in file_names]
+
+
+def read_documents(out_dir, table_format="wide"):
+    """
+    Reads back the documents written by produce_info_theory_docs, in a dictionary keyed by document name. The values of
+    wide tables are strings, as read by lex_io.read_csv.
+    """
+    docs = {name: lex_io.read_csv(out_dir + "\\" + name + ".csv")
+            for name in ["phonological_entropy", "lexical_surprisals"]}
+    if table_format == "wide":
+        for name in ["phonotactic_fqs", "positional_surprisals"]:
+            docs[name] = lex_io.read_csv(out_dir + "\\" + name + ".csv")
+    else:
+        docs["phonotactic_fqs"], docs["positional_surprisals"] = \
+            lex_io.read_positional_table(get_document_paths(out_dir, table_format)[0])
+    return docs
+
+
+def write_table_format(out_dir, table_format):
+    """
+    Writes the table format of the positional tables in out_dir to table_format.txt.
+    """
+    with open(out_dir + "\\" + TABLE_FORMAT_NAME + ".txt", "w", encoding="utf-8") as f:
+        f.write(table_format + "\n")
+
+
+def read_groups(doc_path, group_columns):
+    """
+    Reads the grouping columns of a document with one row per lexeme (e.g. output.csv), and returns a dictionary of
+    column -> group of each lexeme.
+    """
+    rows = lex_io.read_csv(doc_path)
+    missing = [column for column in group_columns if len(rows) > 0 and column not in rows[0]]
+    if len(missing) > 0:
+        raise ValueError("Grouping columns not found in " + doc_path + ": " + ", ".join(missing))
+    return {column: [row[column] for row in rows] for column in group_columns}
+
+
+def get_group_name(column, group):
+    """
+    Returns the name of the folder of a group, in which characters that cannot be used in a folder name are replaced.
+    """
+    return column + "_" + re.sub(r"[^\w\-]", "_", group)
+
+
+def _produce_positional_docs(counts, max_syl, seg_configs, out_dir, backend, table_format="wide"):
+    """
+    Produces and writes phonotactic_fqs, phonological_entropy and positional_surprisals from the output of
+    itf.get_positional_counts. With the long or binary table format, phonotactic_fqs and positional_surprisals are
+    written together as positional_table.
+    """
+    freq_dict = itf.get_frequency_rows_from_counts(counts, max_syl, seg_configs)
+    write_table_format(out_dir, table_format)
+    # save document
+    if table_format == "wide":
+        lex_io.write_dict_to_csv(freq_dict, "phonotactic_fqs", out_dir)
+    if backend == "numpy":
+        import info_theory_arrays as ita
+        fq_table = ita.get_frequency_matrix_from_counts(counts, max_syl, seg_configs)
+        functions = ita
+    else:
+        fq_table = freq_dict
+        functions = itf
+    # calculate entropy for syllable positions
+    phon_ent = functions.get_phontactic_entropies(fq_table)
+    lex_io.write_dict_to_csv(phon_ent, "phonological_entropy", out_dir)
+
+    # get positional surprisals
+    phonol_surprisals = functions.get_phonotactic_surprisals(fq_table)
+    # save phonological surprisals
+    if table_format == "wide":
+        lex_io.write_dict_to_csv(phonol_surprisals, "positional_surprisals", out_dir)
+    elif table_format == "long":
+        lex_io.write_positional_table_long(freq_dict, phonol_surprisals, out_dir)
+    else:
+        lex_io.write_positional_table_binary(freq_dict, phonol_surprisals, out_dir)
+    return {"phonotactic_fqs": freq_dict, "phonological_entropy": phon_ent,
+            "positional_surprisals": phonol_surprisals}
+
+
+def _produce_lexicon_docs(encoded_lex, seg_configs, out_dir, backend, leave_one_out, table_format):
+    """
+    Produces and writes every document of produce_info_theory_docs for an EncodedLexicon, in a single process.
+    """
+    # make new phonotactic fqs
+    counts, max_syl = encoded_lex.get_positional_counts()
+    docs = _produce_positional_docs(counts, max_syl, seg_configs, out_dir, backend, table_format)
+
+    # get surprisals of lexicon
+    lex_sur = encoded_lex.get_surprisals(itf.get_surprisal_index(docs["positional_surprisals"]))
+    lex_io.write_dict_to_csv(lex_sur, "lexical_surprisals", out_dir)
+    docs["lexical_surprisals"] = lex_sur
+    if leave_one_out:
+        loo_sur = encoded_lex.get_leave_one_out_surprisals(docs["phonotactic_fqs"])
+        lex_io.write_dict_to_csv(loo_sur, "lexical_surprisals_loo", out_dir)
+        docs["lexical_surprisals_loo"] = loo_sur
+    return docs
+
+
+def _produce_group_docs(encoded_lex, seg_configs, groups, out_dir, backend, leave_one_out, table_format):
+    """
+    Produces the documents of each group of lexemes in its own folder (see get_group_name) in out_dir\\groups, and
+    writes group_index. groups is a dictionary of grouping column -> group of each lexeme. Each group is analysed as
+    if it were the whole lexicon, so its configuration columns are those of seg_configs that occur in it. Returns a
+    dictionary of (column, group) -> documents.
+    """
+    for column, column_groups in groups.items():
+        if len(column_groups) != len(encoded_lex):
+            raise ValueError("Grouping column " + column + " has " + str(len(column_groups)) + " rows, but there are "
+                             + str(len(encoded_lex)) + " lexemes")
+    lexeme_groups = list(zip(*[[(column, str(group)) for group in column_groups]
+                               for column, column_groups in groups.items()]))
+    group_dir = out_dir + "\\groups"
+    group_docs = {}
+    index_rows = []
+    parts = encoded_lex.split_by_group(lexeme_groups)
+    columns = list(groups)
+    # groups are listed column by column, each in order of first appearance
+    for (column, group), part in sorted(parts.items(), key=lambda item: columns.index(item[0][0])):
+        group_name = get_group_name(column, group)
+        if group_name in [row["folder"] for row in index_rows]:
+            raise ValueError("Two groups of column " + column + " have the same folder name: " + group_name)
+        Path(group_dir + "\\" + group_name).mkdir(parents=True, exist_ok=True)
+        part_configs = {part.configs[config_id] for config_id in set(part.position_configs)}
+        group_configs = [config for config in seg_configs if config in part_configs]
+        group_docs[(column, group)] = _produce_lexicon_docs(part, group_configs, group_dir + "\\" + group_name,
+                                                            backend, leave_one_out, table_format)
+        index_rows.append({"column": column, "group": group, "lexemes": len(part), "folder": group_name})
+    if len(index_rows) > 0:
+        lex_io.write_dict_to_csv(index_rows, "group_index", group_dir)
+    return group_docs
+
+
+def produce_info_theory_docs(syl_lex, seg_configs, out_dir, backend="python", workers=1, leave_one_out=False,
+                             table_format="wide", groups=None):
+    """
+    Produces phonotactic_fqs, phonological_entropy, positional_surprisals and lexical_surprisals for the syllabified
+    lexicon, writes them to out_dir as .csv documents, and returns them in a dictionary keyed by document name. If
+    workers is greater than 1, counting and scoring are run in a pool of that many processes. If leave_one_out is set,
+    lexical_surprisals_loo is also produced. table_format is one of TABLE_FORMATS. If groups is given (a dictionary of
+    grouping column -> group of each lexeme, as returned by read_groups), the documents of each group are also
+    produced, and returned under "groups" (see _produce_group_docs).
+    """
+    encoded_lex = None
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            state = sharded_analysis.get_count_state_parallel(syl_lex, workers, executor=executor)
+            docs = _produce_positional_docs(state.counts, state.max_syl, seg_configs, out_dir, backend,
+                                            table_format)
+            lex_sur = sharded_analysis.get_surprisals_of_lexicon_parallel(syl_lex, docs["positional_surprisals"],
+                                                                          workers, executor=executor)
+        # save lexicon surprisals
+        lex_io.write_dict_to_csv(lex_sur, "lexical_surprisals", out_dir)
+        docs["lexical_surprisals"] = lex_sur
+        if leave_one_out:
+            loo_sur = itf.get_leave_one_out_surprisals_of_lexicon(syl_lex, docs["phonotactic_fqs"])
+            lex_io.write_dict_to_csv(loo_sur, "lexical_surprisals_loo", out_dir)
+            docs["lexical_surprisals_loo"] = loo_sur
+    else:
+        # encode the lexicon once, so that it is not split again for counting, for each round of scoring or for groups
+        encoded_lex = EncodedLexicon.from_lexicon(syl_lex, seg_configs)
+        docs = _produce_lexicon_docs(encoded_lex, seg_configs, out_dir, backend, leave_one_out, table_format)
+    if groups:
+        if encoded_lex is None:
+            encoded_lex = EncodedLexicon.from_lexicon(syl_lex, seg_configs)
+        docs["groups"] = _produce_group_docs(encoded_lex, seg_configs, groups, out_dir, backend, leave_one_out,
+                                             table_format)
+    return docs
+
+
+def produce_info_theory_docs_streamed(syl_lex_dir, seg_configs, out_dir, backend="python", chunk_size=100000,
+                                      state=None, leave_one_out=False, table_format="wide"):
+    """
+    Produces the same documents as produce_info_theory_docs, reading the lexicon document in chunks. The first pass
+    folds the chunks into a CountState (skipped if a state is given), and the second pass scores each chunk and writes
+    its lexical surprisals. Returns the CountState and the positional documents. Lexical surprisals are only written.
+    """
+    if state is None:
+        state = CountState()
+        for chunk in lex_io.iter_lexicon_chunks(syl_lex_dir, chunk_size):
+            state.add_lexicon(chunk)
+    docs = _produce_positional_docs(state.counts, state.max_syl, seg_configs, out_dir, backend, table_format)
+
+    sur_index = itf.get_surprisal_index(docs["positional_surprisals"])
+    lex_sur_chunks = (itf.get_surprisals_of_lexicon(chunk, sur_index)
+                      for chunk in lex_io.iter_lexicon_chunks(syl_lex_dir, chunk_size))
+    lex_io.write_dict_chunks_to_csv(lex_sur_chunks, "lexical_surprisals", out_dir)
+    if leave_one_out:
+        loo_sur_chunks = (itf.get_leave_one_out_surprisals_of_lexicon(chunk, docs["phonotactic_fqs"])
+                          for chunk in lex_io.iter_lexicon_chunks(syl_lex_dir, chunk_size))
+        lex_io.write_dict_chunks_to_csv(loo_sur_chunks, "lexical_surprisals_loo", out_dir)
+    return state, docs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("syl_lex_dir")
+    parser.add_argument("seg_config_dir")
+    parser.add_argument("--backend", choices=["python", "numpy"], default="python")
+    parser.add_argument("--stream", action="store_true", help="read the syllabified lexicon in chunks")
+    parser.add_argument("--chunk-size", type=int, default=100000)
+    parser.add_argument("--save-state", help="with --stream, save the CountState of the lexicon to this .json document")
+    parser.add_argument("--load-state", help="with --stream, use this saved CountState instead of counting the lexicon")
+    parser.add_argument("--workers", type=int, default=1, help="number of processes used to count and score the lexicon")
+    parser.add_argument("--leave-one-out", action="store_true",
+                        help="also score each lexeme against a model without it (lexical_surprisals_loo)")
+    parser.add_argument("--table-format", choices=TABLE_FORMATS, default="wide",
+                        help="write phonotactic_fqs and positional_surprisals as wide tables, or together as a sparse "
+                             "long .csv or binary .bin positional_table")
+    parser.add_argument("--group-by", help="comma-separated columns of output.csv (in the folder of syl_lex_dir), "
+                                           "e.g. pos, whose groups are also analysed separately")
+    args = parser.parse_args()
+    if args.stream and args.workers > 1:
+        parser.error("--workers cannot be used with --stream")
+    if args.stream and args.group_by:
+        parser.error("--group-by cannot be used with --stream")
+    if not args.stream and (args.save_state or args.load_state):
+        parser.error("--save-state/--load-state require --stream")
+
+    # create output dir for python analysis documents if it does not exist
+    out_dir = os.path.dirname(args.syl_lex_dir)
+    seg_configs = lex_io.read_lexicon_file(args.seg_config_dir)
+
+    if args.stream:
+        loaded_state = CountState.load(args.load_state) if args.load_state else None
+        count_state, _docs = produce_info_theory_docs_streamed(args.syl_lex_dir, seg_configs, out_dir, args.backend,
+                                                               args.chunk_size, loaded_state, args.leave_one_out,
+                                                               args.table_format)
+        if args.save_state:
+            count_state.save(args.save_state)
+    else:
+        syl_lex = lex_io.read_lexicon_file(args.syl_lex_dir)
+        lexeme_groups = read_groups(out_dir + "\\output.csv", args.group_by.split(",")) if args.group_by else None
+        produce_info_theory_docs(syl_lex, seg_configs, out_dir, args.backend, args.workers, args.leave_one_out,
+                                 args.table_format, lexeme_groups)
@@ -1,21 +1,33 @@
 """
 NAME: produce_segmental_configurations_list.py
 CREATED: 22-MAR-20
-LAST EDIT: 22-MAR-20
+LAST EDIT: 18-OCT-26
 CREATOR: Author
 EMAIL: 62926253+kroot-kaytetye@users.noreply.github.com
 PROJECT: kroot
 SUMMARY: Receives a list of syllabified Kaytetye lexemes, and outputs all possible consonant and vowel configurations
          for each phonotactic position (syllable, nucleus, coda). This output (phon_configs.txt) is required for
         produce_info_theory_docs.py. Uses get_configurations.py, which was created to allow for easy testing.
+FUNCTIONS:
+    produce_configurations
 """
 import sys
-import re
 import os
-from pathlib import Path
 from get_configurations import get_configurations
 
-syl_list = open(sys.argv[1], 'r', encoding="utf-8").read().splitlines()
-configs = get_configurations(syl_list)
-with open(os.path.dirname(sys.argv[1]) + "\\phon_configs.txt", 'w', encoding="utf-8") as f:
-    f.writelines("\n".join(configs))
+
+def produce_configurations(syl_list, out_dir=None):
+    """
+    Gets the configurations of the syllabified lexicon, and writes them to phon_configs.txt in out_dir if it is given.
+    The configurations are sorted, so that the same lexicon always produces the same document.
+    """
+    configs = sorted(get_configurations(syl_list))
+    if out_dir is not None:
+        with open(out_dir + "\\phon_configs.txt", 'w', encoding="utf-8") as f:
+            f.writelines("\n".join(configs))
+    return configs
+
+
+if __name__ == "__main__":
+    syl_list = open(sys.argv[1], 'r', encoding="utf-8").read().splitlines()
+    produce_configurations(syl_list, os.path.dirname(sys.argv[1]))
@@ -0,0 +1,221 @@
+"""
+NAME: rule_compiler.py
+CREATED: 18-OCT-26
+LAST EDIT: 18-OCT-26
+CREATOR: Author
+EMAIL:  62926253+kroot-kaytetye@users.noreply.github.com
+PROJECT: kroot
+SUMMARY: Compiles the ordered rules of rules.csv into as few passes over each word as possible. Within each rule type
+        (phon and syl), runs of consecutive literal rules that cannot interact with each other are fused into one
+        alternation pass, which gives the same result as applying the rules one after another. Rules which use regular
+        expression syntax, or which could interact with the rules before them, keep a pass of their own. The compiled
+        cascade is cached as a .json document, keyed by a hash of the rules file and of this script. convert_word
+        applies the compiled passes to a word; it only needs re, so the rules can be used without pandas. Run as a
+        script to print a report of which rules were fused, e.g. python rule_compiler.py rules.csv
+FUNCTIONS:
+    _is_literal
+    _overlaps
+    _get_interaction
+    _fused_replacement
+    analyse_cascade
+    build_passes
+    compile_cascade
+    compile_rule_file
+    convert_word
+    get_compile_report
+"""
+from functools import partial
+import hashlib
+import json
+import os
+import re
+import sys
+import lex_io
+
+RULE_TYPES = ["phon", "syl"]
+REGEX_CHARS = set(".^$*+?{}[]\\|()")
+CACHE_NAME = "rule_cascade.json"
+# a cached plan is only reused by the code which analysed it, as a change to the analysis can change which rules fuse
+with open(os.path.abspath(__file__), "rb") as _compiler_file:
+    COMPILER_HASH = hashlib.sha256(_compiler_file.read()).hexdigest()
+
+
+##########################################
+# Private Functions
+##########################################
+def _is_literal(rule):
+    """
+    A rule is literal if its pattern contains no regular expression syntax, and its result contains no escapes or
+    group references. A literal rule behaves like str.replace.
+    """
+    return len(rule["original"]) > 0 and not (set(rule["original"]) & REGEX_CHARS) and "\\" not in rule["result"]
+
+
+def _overlaps(earlier, later):
+    """
+    Checks whether a match of the later pattern can start before a match of the earlier pattern and overlap it. In
+    that case a single left-to-right pass would apply the later rule where the cascade applies the earlier one.
+    """
+    # later contains earlier, but not at its start
+    if earlier in later[1:]:
+        return True
+    # a proper suffix of later is a prefix of earlier
+    for length in range(1, min(len(later), len(earlier))):
+        if later[-length:] == earlier[:length]:
+            return True
+    return False
+
+
+def _get_interaction(run, rule):
+    """
+    Returns the reason why rule cannot be fused with the literal rules in run, or None if it can.
+    """
+    for earlier in run:
+        if len(earlier["result"]) == 0:
+            # a deletion can join text on either side of it into a new match
+            return "rule " + str(earlier["index"]) + " deletes text before it"
+        if set(earlier["result"]) & set(rule["original"]):
+            return "pattern can match the output of rule " + str(earlier["index"])
+        if _overlaps(earlier["original"], rule["original"]):
+            return "pattern overlaps the pattern of rule " + str(earlier["index"])
+    return None
+
+
+def _fused_replacement(replacements, match):
+    """
+    Replacement function for a fused pass. Bound to its table with functools.partial so that it can be pickled.
+    """
+    return replacements[match.group(0)]
+
+
+##########################################
+# Public Functions
+##########################################
+def analyse_cascade(rules):
+    """
+    Takes the rules as a list of dictionaries with 'type', 'original' and 'result' keys, in the order of rules.csv, and
+    groups them into passes. Returns a list of passes, each a dictionary with the rule type, the indices of its rules,
+    whether it is fused, and the reason why its first rule could not join the pass before it.
+    """
+    indexed_rules = []
+    for index, rule in enumerate(rules):
+        indexed_rules.append({"index": index, "type": str(rule["type"]), "original": str(rule["original"]),
+                              "result": str(rule["result"])})
+    plan = []
+    for rule_type in RULE_TYPES:
+        run = []
+        for rule in indexed_rules:
+            if rule["type"] != rule_type:
+                continue
+            if not _is_literal(rule):
+                reason = "uses regular expression syntax"
+            elif len(run) == 0:
+                reason = None
+            else:
+                reason = _get_interaction(run, rule)
+            if reason is None and len(run) > 0:
+                plan[-1]["rules"].append(rule["index"])
+                plan[-1]["fused"] = True
+                run.append(rule)
+                continue
+            plan.append({"type": rule_type, "rules": [rule["index"]], "fused": False, "reason": reason})
+            run = [rule] if _is_literal(rule) else []
+    return plan
+
+
+def build_passes(rules, plan):
+    """
+    Builds the output of analyse_cascade into compiled passes. Returns the phon passes and the syl passes as two lists of
+    (compiled pattern, replacement) pairs, in the format used by convert_word.
+    """
+    passes = {rule_type: [] for rule_type in RULE_TYPES}
+    for rule_pass in plan:
+        pass_rules = [rules[index] for index in rule_pass["rules"]]
+        if rule_pass["fused"]:
+            replacements = {}
+            for rule in pass_rules:
+                # if two rules share a pattern, the first one applies, as in the cascade
+                replacements.setdefault(str(rule["original"]), str(rule["result"]))
+            pattern = re.compile("|".join(re.escape(original) for original in replacements.keys()))
+            passes[rule_pass["type"]].append((pattern, partial(_fused_replacement, replacements)))
+        else:
+            rule = pass_rules[0]
+            passes[rule_pass["type"]].append((re.compile(str(rule["original"])), str(rule["result"])))
+    return passes["phon"], passes["syl"]
+
+
+def compile_cascade(rules):
+    """
+    Analyses and builds the rules in one step, without caching.
+    """
+    return build_passes(rules, analyse_cascade(rules))
+
+
+def compile_rule_file(rules_path, cache_dir=None):
+    """
+    Reads rules.csv and compiles it. If cache_dir is given, the analysis is read from (or written to) rule_cascade.json
+    in that folder, and reused while the hashes of the rules file and of rule_compiler.py are unchanged. Returns the
+    compiled passes and the plan.
+    """
+    with open(rules_path, "rb") as f:
+        rules_hash = hashlib.sha256(f.read()).hexdigest()
+    rules = lex_io.read_csv(rules_path)
+    plan = None
+    if cache_dir is not None:
+        cache_path = os.path.join(cache_dir, CACHE_NAME)
+        if os.path.exists(cache_path):
+            with open(cache_path, encoding="utf-8") as f:
+                cache = json.load(f)
+            if cache.get("rules_hash") == rules_hash and cache.get("compiler_hash") == COMPILER_HASH:
+                plan = cache["plan"]
+    if plan is None:
+        plan = analyse_cascade(rules)
+        if cache_dir is not None:
+            with open(os.path.join(cache_dir, CACHE_NAME), "w", encoding="utf-8") as f:
+                json.dump({"rules_hash": rules_hash, "compiler_hash": COMPILER_HASH, "plan": plan}, f,
+                          ensure_ascii=False, indent=1)
+    return build_passes(rules, plan), plan
+
+
+def convert_word(word, compiled_rules):
+    """
+    Applies the compiled passes of compile_rule_file to an orthographic form, and returns the ipa form and the
+    syllabified ipa form.
+    """
+    compiled_phon, compiled_syl = compiled_rules
+    in_phon = word
+    for pattern, result in compiled_phon:
+        in_phon = pattern.sub(result, in_phon)
+    phon = in_phon
+    # create syllabified form with in_syl
+    for pattern, result in compiled_syl:
+        in_phon = pattern.sub(result, in_phon)
+    return phon, in_phon
+
+
+def get_compile_report(rules, plan):
+    """
+    Produces a list of lines describing which rules were fused into a shared pass, and which kept their own pass and why.
+    """
+    report = []
+    fused_count = 0
+    for rule_pass in plan:
+        descriptions = []
+        for index in rule_pass["rules"]:
+            rule = rules[index]
+            descriptions.append("rule " + str(index) + " (" + str(rule["original"]) + " -> " + str(rule["result"]) + ")")
+        if rule_pass["fused"]:
+            fused_count = fused_count + len(rule_pass["rules"])
+            report.append(rule_pass["type"] + " fused: " + ", ".join(descriptions))
+        elif rule_pass["reason"] is not None:
+            report.append(rule_pass["type"] + " own pass: " + descriptions[0] + ": " + rule_pass["reason"])
+        else:
+            report.append(rule_pass["type"] + " own pass: " + descriptions[0])
+    report.append(str(len(rules)) + " rules compiled into " + str(len(plan)) + " passes (" + str(fused_count) +
+                  " rules fused)")
+    return report
+
+
+if __name__ == "__main__":
+    compiled, cascade_plan = compile_rule_file(sys.argv[1])
+    print("\n".join(get_compile_report(lex_io.read_csv(sys.argv[1]), cascade_plan)))
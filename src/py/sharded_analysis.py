@@ -0,0 +1,83 @@
+"""
+NAME: sharded_analysis.py
+CREATED: 18-OCT-26
+LAST EDIT: 18-OCT-26
+CREATOR: Author
+EMAIL:  62926253+kroot-kaytetye@users.noreply.github.com
+PROJECT: kroot
+SUMMARY: Parallel versions of the counting and scoring steps of produce_info_theory_docs.py. The lexicon is split into
+        shards which are sent to a pool of worker processes. Each worker counts the positional configurations of its
+        shard into a CountState, and the states are merged in shard order. Once the surprisal table exists, the shards
+        are scored in parallel and their lexical surprisals are joined in the original order. The counts are integers
+        and each word is scored exactly as in the serial functions, so the results are identical to the serial path.
+FUNCTIONS:
+    _count_shard
+    _score_shard
+    get_shards
+    get_count_state_parallel
+    get_surprisals_of_lexicon_parallel
+"""
+from concurrent.futures import ProcessPoolExecutor
+import math
+import info_theory_functions as itf
+from count_state import CountState
+
+# number of shards given to each worker, so that shards of slow words do not leave the other workers idle
+SHARDS_PER_WORKER = 4
+
+
+##########################################
+# Private Functions
+##########################################
+def _count_shard(shard):
+    return CountState().add_lexicon(shard)
+
+
+def _score_shard(shard, sur_index):
+    return itf.get_surprisals_of_lexicon(shard, sur_index)
+
+
+##########################################
+# Public Functions
+##########################################
+def get_shards(syl_lex, workers, shard_size=None):
+    """
+    Splits the lexicon into consecutive shards. If shard_size is not given, each worker receives SHARDS_PER_WORKER shards.
+    """
+    if shard_size is None:
+        shard_size = max(1, math.ceil(len(syl_lex) / (workers * SHARDS_PER_WORKER)))
+    return [syl_lex[i:i + shard_size] for i in range(0, len(syl_lex), shard_size)]
+
+
+def get_count_state_parallel(syl_lex, workers, shard_size=None, executor=None):
+    """
+    Counts the positional configurations of the lexicon across worker processes, and returns the merged CountState.
+    An existing ProcessPoolExecutor can be given to reuse its processes.
+    """
+    shards = get_shards(syl_lex, workers, shard_size)
+    if executor is None:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            shard_states = list(pool.map(_count_shard, shards))
+    else:
+        shard_states = list(executor.map(_count_shard, shards))
+    state = CountState()
+    for shard_state in shard_states:
+        state.merge(shard_state)
+    return state
+
+
+def get_surprisals_of_lexicon_parallel(syl_lex, sur_dict_list, workers, shard_size=None, executor=None):
+    """
+    Parallel version of itf.get_surprisals_of_lexicon. Returns the lexical surprisals in the order of syl_lex.
+    """
+    if isinstance(sur_dict_list, dict):
+        sur_index = sur_dict_list
+    else:
+        sur_index = itf.get_surprisal_index(sur_dict_list)
+    shards = get_shards(syl_lex, workers, shard_size)
+    if executor is None:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            shard_surprisals = list(pool.map(_score_shard, shards, [sur_index] * len(shards)))
+    else:
+        shard_surprisals = list(executor.map(_score_shard, shards, [sur_index] * len(shards)))
+    return [out_dict for shard_out in shard_surprisals for out_dict in shard_out]
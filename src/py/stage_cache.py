@@ -0,0 +1,85 @@
+"""
+NAME: stage_cache.py
+CREATED: 18-OCT-26
+LAST EDIT: 18-OCT-26
+CREATOR: Author
+EMAIL:  62926253+kroot-kaytetye@users.noreply.github.com
+PROJECT: kroot
+SUMMARY: Cache manifest for the stages of pipeline.py. The manifest (cache_manifest.json in py_outputs) records, for
+        each stage, a key made from the hashes of its input documents, its parameters and the source code of the
+        scripts it runs, together with the hashes of the documents it wrote. A stage whose key matches the manifest,
+        and whose outputs are unchanged on disk, can be skipped and its outputs reused.
+FUNCTIONS:
+    hash_file
+    get_stage_key
+    load_manifest
+    save_manifest
+    is_stage_fresh
+    record_stage
+"""
+import hashlib
+import json
+import os
+
+MANIFEST_NAME = "cache_manifest.json"
+# increase when the layout of the manifest changes, so that old manifests are ignored
+MANIFEST_VERSION = 1
+
+
+def hash_file(path):
+    """
+    Returns the sha256 hash of a document.
+    """
+    file_hash = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+
+def get_stage_key(input_paths, params, code_paths):
+    """
+    Combines the hashes of the input documents and source code with the stage parameters into a single key.
+    """
+    key_data = {"inputs": [hash_file(path) for path in input_paths],
+                "code": [hash_file(path) for path in code_paths],
+                "params": params}
+    return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def load_manifest(out_dir):
+    """
+    Reads the manifest in out_dir. Returns an empty manifest if there is none, or if it was written by another version.
+    """
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+    return {"version": MANIFEST_VERSION, "stages": {}}
+
+
+def save_manifest(out_dir, manifest):
+    with open(os.path.join(out_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+
+
+def is_stage_fresh(manifest, stage, key):
+    """
+    Checks whether the stage was last run with the same key, and its recorded outputs still exist unchanged.
+    """
+    entry = manifest["stages"].get(stage)
+    if entry is None or entry["key"] != key:
+        return False
+    for path, output_hash in entry["outputs"].items():
+        if not os.path.exists(path) or hash_file(path) != output_hash:
+            return False
+    return True
+
+
+def record_stage(manifest, stage, key, output_paths):
+    """
+    Records the key of a stage that has just run, with the hashes of the documents it wrote.
+    """
+    manifest["stages"][stage] = {"key": key, "outputs": {path: hash_file(path) for path in output_paths}}
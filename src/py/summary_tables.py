@@ -0,0 +1,213 @@
+"""
+NAME: summary_tables.py
+CREATED: 18-OCT-26
+LAST EDIT: 18-OCT-26
+CREATOR: Author
+EMAIL:  62926253+kroot-kaytetye@users.noreply.github.com
+PROJECT: kroot
+SUMMARY: Produces the summary tables in r_tables which were previously built by produce_entropy_plots.r, from the
+        outputs of get_phontactic_entropies and get_surprisals_of_lexicon:
+        entropy_tab: positional entropies with plot labels.
+        lexemes_by_category: each lexeme with its vowel count, whether it is vowel-initial, and its category (e.g. V_2).
+        surprisal_categories: mean surprisal, difference from the mean of the category means, and standard deviation
+        of each category.
+        category_frequencies_with_sum_entropy: frequency of each category, with the sum of the entropies of its
+        positions.
+        syl_templates: frequency of each CV template, with a Total row for each number of syllables.
+        highest_lowest_surs_tab: the 10 distinct lexemes with the lowest and the 10 with the highest mean surprisal.
+        Categories are aggregated with pandas group-by operations instead of per-lexeme loops. The documents are
+        written as readr::write_csv wrote them, so produce_entropy_plots.r only needs to read them to draw its plots.
+        Called by pipeline.py, or run on the documents in py_outputs.
+EXAMPLE CALL: python summary_tables.py C:\\docs\\kroot_docs
+FUNCTIONS:
+    _format_double
+    _write_table
+    _get_label_name
+    _get_sum_entropy
+    get_entropy_table
+    get_lexeme_categories
+    get_surprisal_categories
+    get_category_frequencies
+    get_syllable_templates
+    get_highest_lowest_surprisals
+    produce_summary_tables
+"""
+import argparse
+import math
+import os
+from pathlib import Path
+import pandas as ps
+import lex_io
+
+# vowels counted for the categories, as in the regular expression of produce_entropy_plots.r
+CATEGORY_VOWELS = "[\u0250\u0259iIuU]"
+# vowels of the CV templates
+TEMPLATE_VOWELS = "[\u0259\u0250iu]"
+TABLE_NAMES = ["entropy_tab", "lexemes_by_category", "surprisal_categories", "category_frequencies_with_sum_entropy",
+               "syl_templates", "highest_lowest_surs_tab"]
+
+
+##########################################
+# Private Functions
+##########################################
+def _format_double(value):
+    """
+    Formats a number as readr::write_csv does: the shortest form which reads back as the same value, with no trailing
+    .0 and no leading zeros in the exponent. Missing values are written as NA.
+    """
+    if value is None or math.isnan(value):
+        return "NA"
+    text = repr(float(value))
+    if text.endswith(".0"):
+        text = text[:-2]
+    mantissa, exponent_sign, exponent = text.partition("e")
+    if exponent_sign != "":
+        text = mantissa + "e" + str(int(exponent))
+    return text
+
+
+def _write_table(table, name, out_dir):
+    """
+    Writes a table to out_dir\\name.csv, with doubles and logical values formatted as by readr::write_csv.
+    """
+    table = table.copy()
+    for column in table.columns:
+        if table[column].dtype == bool:
+            table[column] = table[column].map({True: "TRUE", False: "FALSE"})
+        elif table[column].dtype.kind == "f":
+            table[column] = table[column].map(_format_double)
+    table.to_csv(out_dir + "\\" + name + ".csv", index=False, encoding="utf-8")
+
+
+def _get_label_name(label):
+    """
+    Returns the plot label of a position label, e.g. Syllable 1 onset for 0_onset, or Syllable final nucleus.
+    """
+    syl, position = label.split("_")
+    if syl == "final":
+        return "Syllable final " + position
+    return "Syllable " + str(int(syl) + 1) + " " + position
+
+
+def _get_sum_entropy(entropy_tab, vowel_count, highest_num):
+    """
+    Sums the entropies of the positions of a lexeme with vowel_count vowels: the positions of every syllable before it,
+    up to the onset of its final syllable, and final_nucleus. As in produce_entropy_plots.r, the nucleus of the
+    syllable before the final syllable is also included if vowel_count is the number of the last numbered syllable.
+    """
+    syl_rows = entropy_tab[entropy_tab["syl_num"] < vowel_count]
+    syl_rows = syl_rows.iloc[:max(len(syl_rows) - (1 if vowel_count == highest_num else 2), 0)]
+    final_rows = entropy_tab[entropy_tab["syl"].str.contains("final")]
+    return syl_rows["entropy"].sum() + final_rows["entropy"].sum()
+
+
+##########################################
+# Public Functions
+##########################################
+def get_entropy_table(entropies):
+    """
+    Returns the output of get_phontactic_entropies as a table with the plot label of each position, without
+    final_coda.
+    """
+    entropy_tab = ps.DataFrame(entropies, columns=["syl", "entropy"]).astype({"entropy": float})
+    entropy_tab["label_names"] = entropy_tab["syl"].map(_get_label_name)
+    return entropy_tab[entropy_tab["label_names"] != "Syllable final coda"].reset_index(drop=True)
+
+
+def get_lexeme_categories(lex_surprisals):
+    """
+    Returns the output of get_surprisals_of_lexicon as a table with the vowel count of each lexeme, whether it begins
+    with a vowel, and its category: V_ or C_ for the first segment, followed by the vowel count.
+    """
+    lexeme_tab = ps.DataFrame(lex_surprisals, columns=["lexeme", "mean_surprisal"]).astype({"mean_surprisal": float})
+    lexeme_tab["vowel_count"] = lexeme_tab["lexeme"].str.count(CATEGORY_VOWELS)
+    lexeme_tab["vowel_initial"] = lexeme_tab["lexeme"].str.match(CATEGORY_VOWELS)
+    lexeme_tab["cat"] = lexeme_tab["vowel_initial"].map({True: "V_", False: "C_"}) + \
+        lexeme_tab["vowel_count"].astype(str)
+    return lexeme_tab
+
+
+def get_surprisal_categories(lexeme_tab):
+    """
+    Returns the mean surprisal of each category (rounded to 4 digits), its difference from the mean of the category
+    means, and the standard deviation of the surprisals in the category. Categories are in order of first appearance.
+    """
+    grouped = lexeme_tab.groupby("cat", sort=False)["mean_surprisal"]
+    category_tab = grouped.agg(["mean", "std"]).reset_index().rename(columns={"cat": "cats"})
+    category_tab["mean_surp"] = category_tab["mean"].round(4)
+    category_tab["mean_diff"] = category_tab["mean_surp"] - category_tab["mean_surp"].mean()
+    category_tab["std_dev"] = category_tab["std"]
+    return category_tab[["cats", "mean_surp", "mean_diff", "std_dev"]]
+
+
+def get_category_frequencies(lexeme_tab, entropy_tab):
+    """
+    Returns the frequency of each category (in sorted order, as by table() in R), with the sum of the entropies of the
+    positions of a lexeme with its vowel count (see _get_sum_entropy).
+    """
+    frequency_tab = lexeme_tab["cat"].value_counts().sort_index().rename_axis(".").reset_index(name="Freq")
+    entropy_tab = entropy_tab.assign(syl_num=entropy_tab["syl"].map(
+        lambda label: 100 if label.startswith("final") else int(label.split("_")[0])))
+    # the highest syllable number, after final_nucleus (100)
+    highest_num = entropy_tab["syl_num"].sort_values().iloc[-2] if len(entropy_tab) > 1 else None
+    vowel_counts = frequency_tab["."].str.split("_").str[1].astype(int)
+    sum_entropies = {count: _get_sum_entropy(entropy_tab, count, highest_num) for count in vowel_counts.unique()}
+    frequency_tab["sum_entropy"] = vowel_counts.map(sum_entropies).astype(float)
+    return frequency_tab
+
+
+def get_syllable_templates(lexeme_tab):
+    """
+    Returns the frequency and proportion of each CV template (in sorted order), with its number of syllables. After
+    them, a Total row is added for each number of syllables. As in produce_entropy_plots.r, every column is text once
+    the Total rows are added, with proportions written to 15 significant digits.
+    """
+    templates = lexeme_tab["lexeme"].str.replace(".", "", regex=False).str.replace(TEMPLATE_VOWELS, "V", regex=True) \
+        .str.replace("[^\u0259\u0250iuV:]+", "C", regex=True)
+    template_tab = templates.value_counts().sort_index().rename_axis(".").reset_index(name="Freq")
+    template_tab["proport"] = template_tab["Freq"] / template_tab["Freq"].sum()
+    template_tab["num_syls"] = template_tab["."].str.count("V")
+    totals = template_tab.groupby("num_syls", sort=False).agg(Freq=("Freq", "sum"), proport=("proport", "sum"))
+    totals = totals.reset_index().assign(**{".": "Total"})
+    template_tab = ps.concat([template_tab, totals[[".", "Freq", "proport", "num_syls"]]], ignore_index=True)
+    template_tab["proport"] = template_tab["proport"].map(lambda proportion: format(proportion, ".15g"))
+    return template_tab.astype(str)
+
+
+def get_highest_lowest_surprisals(lexeme_tab, count=10):
+    """
+    Returns the count distinct lexemes with the lowest mean surprisal, followed by the count with the highest, both in
+    ascending order.
+    """
+    unique_tab = lexeme_tab.drop_duplicates("lexeme").sort_values("mean_surprisal", kind="stable")
+    return ps.concat([unique_tab.head(count), unique_tab.tail(count)], ignore_index=True)
+
+
+def produce_summary_tables(lex_surprisals, entropies, out_dir):
+    """
+    Produces every summary table from the outputs of get_surprisals_of_lexicon and get_phontactic_entropies (or the
+    same documents read back with lex_io.read_csv), writes them to out_dir as .csv documents, and returns them in a
+    dictionary keyed by document name.
+    """
+    entropy_tab = get_entropy_table(entropies)
+    lexeme_tab = get_lexeme_categories(lex_surprisals)
+    tables = {"entropy_tab": entropy_tab, "lexemes_by_category": lexeme_tab,
+              "surprisal_categories": get_surprisal_categories(lexeme_tab),
+              "category_frequencies_with_sum_entropy": get_category_frequencies(lexeme_tab, entropy_tab),
+              "syl_templates": get_syllable_templates(lexeme_tab),
+              "highest_lowest_surs_tab": get_highest_lowest_surprisals(lexeme_tab)}
+    for name in TABLE_NAMES:
+        _write_table(tables[name], name, out_dir)
+    return tables
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("data_dir", help="folder which contains py_outputs, e.g. the folder given to pipeline.py")
+    args = parser.parse_args()
+
+    py_dir = os.path.join(args.data_dir, "py_outputs")
+    tables_dir = os.path.join(args.data_dir, "r_tables")
+    Path(tables_dir).mkdir(parents=True, exist_ok=True)
+    produce_summary_tables(lex_io.read_csv(py_dir + "\\lexical_surprisals.csv"),
+                           lex_io.read_csv(py_dir + "\\phonological_entropy.csv"), tables_dir)
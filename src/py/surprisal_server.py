@@ -0,0 +1,172 @@
+"""
+NAME: surprisal_server.py
+CREATED: 18-OCT-26
+LAST EDIT: 18-OCT-26
+CREATOR: Author
+EMAIL:  62926253+kroot-kaytetye@users.noreply.github.com
+PROJECT: kroot
+SUMMARY: Long-lived scoring process for new word forms. The positional surprisal table (positional_surprisals.csv) and,
+        optionally, the orth_to_ipa rules are loaded once at startup. A sparse positional_table (.csv or .bin) can be
+        loaded instead of positional_surprisals.csv. Requests are read as JSON lines, either from stdin or from a local
+        socket (--port), and each is answered with one JSON line.
+        Request: {"id": 1, "forms": ["ku.nə", ...], "orthographic": false}
+        Response: {"id": 1, "results": [{"form": "ku.nə", "syllabified": "ku.nə", "positions": [...],
+                   "mean_surprisal": 1.23, "unseen_positions": 0}, ...]}
+        Each position gives its label, configuration and surprisal. A configuration that never occurs in its position
+        has a surprisal of null, and the mean surprisal of the form is then -1. Otherwise the mean surprisal is the same
+        as in lexical_surprisals. Forms which cannot be split into syllables are answered with an "error" field.
+EXAMPLE CALLS: python surprisal_server.py C:\\docs\\kroot_docs\\py_outputs\\positional_surprisals.csv --rules rules.csv
+               python surprisal_server.py positional_surprisals.csv --port 8765
+CLASSES:
+    SurprisalScorer
+    _ScoringHandler
+FUNCTIONS:
+    handle_request
+    serve_stdio
+    serve_socket
+"""
+import argparse
+from functools import lru_cache
+import json
+import os
+import socketserver
+import sys
+import info_theory_functions as itf
+import lex_io
+import rule_compiler
+
+
+class SurprisalScorer:
+    """
+    sur_index: lookup table from itf.get_surprisal_index.
+    compiled_rules: output of rule_compiler.compile_rule_file, needed to score orthographic forms.
+    cache_size: number of scored forms that are kept, so that repeated forms are not scored again.
+    """
+
+    def __init__(self, sur_index, compiled_rules=None, cache_size=100000):
+        self.sur_index = sur_index
+        self.compiled_rules = compiled_rules
+        self.score_syllabified = lru_cache(maxsize=cache_size)(self._score_syllabified)
+
+    @classmethod
+    def from_files(cls, surprisals_path, rules_path=None, cache_size=100000):
+        if surprisals_path.endswith(".bin") or lex_io.POSITIONAL_TABLE_NAME in os.path.basename(surprisals_path):
+            # sparse positional_table written with --table-format long or binary
+            _fq_dict, sur_dict_list = lex_io.read_positional_table(surprisals_path)
+            sur_index = itf.get_surprisal_index(sur_dict_list)
+        else:
+            sur_index = itf.get_surprisal_index(lex_io.read_csv(surprisals_path))
+        compiled_rules = None
+        if rules_path is not None:
+            compiled_rules, _plan = rule_compiler.compile_rule_file(rules_path)
+        return cls(sur_index, compiled_rules, cache_size)
+
+    def _score_syllabified(self, syl_form):
+        positions = []
+        surprisal_value = 0
+        unseen_positions = 0
+        word_positions = itf.get_word_positions(syl_form.split("."))
+        # sum each syllable (three positions) before adding it to the total, as in itf.get_surprisals_of_lexicon
+        for i in range(0, len(word_positions), 3):
+            syl_surprisals = []
+            for label, config in word_positions[i:i + 3]:
+                surprisal = self.sur_index.get(label, {}).get(config, -1)
+                if surprisal == -1:
+                    unseen_positions = unseen_positions + 1
+                    positions.append({"position": label, "configuration": config, "surprisal": None})
+                else:
+                    syl_surprisals.append(surprisal)
+                    positions.append({"position": label, "configuration": config, "surprisal": surprisal})
+            surprisal_value = surprisal_value + sum(syl_surprisals)
+        if unseen_positions > 0:
+            mean_surprisal = -1
+        else:
+            mean_surprisal = surprisal_value / (len(word_positions) - 1)
+        return {"syllabified": syl_form, "positions": positions, "mean_surprisal": mean_surprisal,
+                "unseen_positions": unseen_positions}
+
+    def score(self, form, orthographic=False):
+        """
+        Scores a single form. Orthographic forms are converted with the orth_to_ipa rules first.
+        """
+        if orthographic:
+            if self.compiled_rules is None:
+                raise ValueError("No orth_to_ipa rules were loaded, so orthographic forms cannot be scored")
+            syl_form = rule_compiler.convert_word(form, self.compiled_rules)[1]
+        else:
+            syl_form = form
+        result = {"form": form}
+        result.update(self.score_syllabified(syl_form))
+        return result
+
+
+##########################################
+# Public Functions
+##########################################
+def handle_request(scorer, line):
+    """
+    Answers one JSON line request with one JSON line response. Errors in single forms are reported in their result,
+    while a malformed request is answered with a single "error" field.
+    """
+    try:
+        request = json.loads(line)
+        forms = request["forms"]
+        if not isinstance(forms, list):
+            raise TypeError("forms must be a list of forms")
+        orthographic = request.get("orthographic", False)
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        return json.dumps({"error": "Malformed request: " + str(e)}, ensure_ascii=False)
+    results = []
+    for form in forms:
+        try:
+            results.append(scorer.score(form, orthographic))
+        except (AssertionError, ValueError, TypeError, AttributeError) as e:
+            results.append({"form": form, "error": str(e) or "Form cannot be split into syllables"})
+    return json.dumps({"id": request.get("id"), "results": results}, ensure_ascii=False)
+
+
+def serve_stdio(scorer, in_stream=sys.stdin, out_stream=sys.stdout):
+    """
+    Answers requests from in_stream until it is closed. Blank lines are ignored.
+    """
+    for line in in_stream:
+        if line.strip() == "":
+            continue
+        out_stream.write(handle_request(scorer, line) + "\n")
+        out_stream.flush()
+
+
+class _ScoringHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            line = line.decode("utf-8")
+            if line.strip() == "":
+                continue
+            self.wfile.write((handle_request(self.server.scorer, line) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+def serve_socket(scorer, port, host="127.0.0.1"):
+    """
+    Answers requests from clients connecting to host:port until interrupted. Each connection is handled in its own thread.
+    """
+    with socketserver.ThreadingTCPServer((host, port), _ScoringHandler) as server:
+        server.daemon_threads = True
+        server.scorer = scorer
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("surprisals_path", help="positional_surprisals.csv or positional_table (.csv or .bin) produced by "
+                        "produce_info_theory_docs.py")
+    parser.add_argument("--rules", help="rules.csv of orth_to_ipa, needed to score orthographic forms")
+    parser.add_argument("--port", type=int, help="listen on this local port instead of stdin")
+    parser.add_argument("--cache-size", type=int, default=100000, help="number of scored forms to keep")
+    args = parser.parse_args()
+
+    surprisal_scorer = SurprisalScorer.from_files(args.surprisals_path, args.rules, args.cache_size)
+    if args.port is None:
+        serve_stdio(surprisal_scorer)
+    else:
+        serve_socket(surprisal_scorer, args.port)
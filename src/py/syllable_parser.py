@@ -0,0 +1,81 @@
+"""
+NAME: syllable_parser.py
+CREATED: 18-OCT-26
+LAST EDIT: 18-OCT-26
+CREATOR: Author
+EMAIL:  62926253+kroot-kaytetye@users.noreply.github.com
+PROJECT: kroot
+SUMMARY: Splits syllables into their onset, nucleus and coda. This is the only syllable parser, used by both
+        get_configurations.py and info_theory_functions.py. The nucleus is the single run of one or two vowel characters
+        in the syllable (VOWEL_CHARS, where ':' marks a long vowel), the onset is everything before it and the coda is
+        everything after it. An empty onset or coda is given as "0". Any other syllable raises a SyllableError.
+        Results are kept in a bounded LRU memo keyed on the syllable text, as a lexicon only has a few thousand distinct
+        syllables. get_cache_stats reports how often the memo was used.
+CLASSES:
+    SyllableError
+FUNCTIONS:
+    _split_syllable
+    split_syllable
+    get_cache_stats
+    clear_cache
+"""
+from functools import lru_cache
+
+# characters which make up the nucleus of a syllable
+VOWEL_CHARS = frozenset("ɐəiu:")
+# maximum number of distinct syllables kept in the memo
+SYLLABLE_CACHE_SIZE = 8192
+
+
+class SyllableError(ValueError):
+    """
+    Raised for a syllable which does not have exactly one nucleus of one or two vowel characters.
+    """
+
+
+##########################################
+# Private Functions
+##########################################
+def _split_syllable(syllable):
+    nucleus_start = None
+    nucleus_end = None
+    for i, char in enumerate(syllable):
+        if char in VOWEL_CHARS:
+            if nucleus_end is not None:
+                raise SyllableError("There must only be one nucleus in a single syllable: " + syllable)
+            if nucleus_start is None:
+                nucleus_start = i
+        elif nucleus_start is not None and nucleus_end is None:
+            nucleus_end = i
+    if nucleus_start is None:
+        raise SyllableError("There must be a vowel phoneme in a single syllable: " + repr(syllable))
+    if nucleus_end is None:
+        nucleus_end = len(syllable)
+    if nucleus_end - nucleus_start > 2:
+        raise SyllableError("There must only be one or two vowel phonemes in a single syllable: " + syllable)
+    return (syllable[:nucleus_start] or "0", syllable[nucleus_start:nucleus_end], syllable[nucleus_end:] or "0")
+
+
+##########################################
+# Public Functions
+##########################################
+@lru_cache(maxsize=SYLLABLE_CACHE_SIZE)
+def split_syllable(syllable):
+    """
+    Takes an input syllable, and returns a tuple of its onset, nucleus and coda.
+    """
+    return _split_syllable(syllable)
+
+
+def get_cache_stats():
+    """
+    Returns the hits, misses and number of syllables held by the memo, and the share of calls that were hits.
+    """
+    info = split_syllable.cache_info()
+    calls = info.hits + info.misses
+    return {"hits": info.hits, "misses": info.misses, "size": info.currsize,
+            "hit_rate": info.hits / calls if calls > 0 else 0}
+
+
+def clear_cache():
+    split_syllable.cache_clear()
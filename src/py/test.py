@@ -6,6 +6,23 @@
 import info_theory_functions as itf
 from math import log
 from get_configurations import get_configurations
+import re
+import rule_compiler
+from count_state import CountState
+from incremental_model import PhonotacticModel
+import json
+from surprisal_server import SurprisalScorer, handle_request
+from encoded_lexicon import EncodedLexicon
+import syllable_parser
+import lex_io
+import os
+import tempfile
+import produce_info_theory_docs as pitd
+import instrumentation
+import summary_tables
+from conditional_model import ConditionalModel
+import validate_lexicon
+import sharded_analysis
 
 
 # test 1: get_configurations
@@ -32,6 +49,10 @@ assert test_phonotac_freq[7]["ə"] == 0, "Wrong number of third syllable nucleus
 assert test_phonotac_freq[8]["n"] == 0, "Wrong number of third syllable coda 'n'!"
 assert test_phonotac_freq[9]["ə"] == 6, "Wrong number for final syllable nucleus schwa!"
 assert test_phonotac_freq[9]["i:"] == 1, "Wrong number for final syllable nucleus schwa!"
+assert [row["syllable"] for row in test_phonotac_freq] == ["0_onset", "0_nucleus", "0_coda", "1_onset", "1_nucleus",
+                                                           "1_coda", "2_onset", "2_nucleus", "2_coda", "final_nucleus",
+                                                           "final_coda"], "Wrong phonotactic positions!"
+assert test_phonotac_freq[10]["0"] == 7, "Wrong number of final syllable null codas!"
 print("Test 2 was successful!")
 
 # test 3: get_phonotactic_surprisals
@@ -57,6 +78,11 @@ assert round(test_lex_surp[3]['mean_surprisal'], 7) == round(((log(5/7, 2) * -1)
 assert round(test_lex_surp[4]['mean_surprisal'], 7) == round(((log(1/7, 2) * -1) + (log(1/7, 2) * -1) + (log(6/7, 2) * -1) + (log(1/7, 2) * -1) + (log(6/7, 2) * -1)) / 5, 7), "Mean surprisals of word do not match!"
 assert round(test_lex_surp[5]['mean_surprisal'], 7) == round(((log(1/7, 2) * -1) + (log(5/7, 2) * -1) + (log(1/7, 2) * -1) + (log(1/7, 2) * -1) + (log(6/7, 2) * -1)) / 5, 7), "Mean surprisals of word do not match!" 
 assert round(test_lex_surp[6]['mean_surprisal'], 7) == round(((log(5/7, 2) * -1) + (log(5/7, 2) * -1) + (log(6/7, 2) * -1) + (log(1/7, 2) * -1) + (log(1/7, 2) * -1)) / 5, 7), "Mean surprisals of word do not match!"
+# scoring against the surprisal table as read back from positional_surprisals.csv gives the same values
+csv_phonotac_surp = [{key: str(value) for key, value in row.items()} for row in test_phonotac_surp]
+assert itf.get_surprisals_of_lexicon(lexicon, csv_phonotac_surp) == test_lex_surp, "Surprisals of re-read table differ!"
+assert itf.get_surprisals_of_lexicon(lexicon, itf.get_surprisal_index(test_phonotac_surp)) == test_lex_surp, \
+    "Surprisals of surprisal index differ!"
 print("Test 4 was successful!")
 
 #test 5: get_phonotactic_entropy
@@ -73,5 +99,359 @@ assert round(test_entropies[6]['entropy'], 7) == round(((log(1/2, 2) * -1) * 1/2
 assert round(test_entropies[9]['entropy'], 7) == round(((log(6/7, 2) * -1) * 6/7) + ((log(1/7, 2) * -1) * 1/7), 7), "Incorrect entropy value!"
 print("Test 5 was successful!")
 
+# test 6: numpy backend. This is skipped if numpy is not installed.
+try:
+    import info_theory_arrays as ita
+except ImportError:
+    ita = None
+if ita is not None:
+    print("Test 6: numpy backend...")
+    test_matrix = ita.get_frequency_matrix(test_phonotac_freq)
+    test_array_entropies = ita.get_phontactic_entropies(test_matrix)
+    for row, array_row in zip(test_entropies, test_array_entropies):
+        assert row["syl"] == array_row["syl"], "Wrong entropy position from numpy backend!"
+        assert round(row["entropy"], 7) == round(array_row["entropy"], 7), "Incorrect entropy from numpy backend!"
+    test_array_surp = ita.get_phonotactic_surprisals(test_matrix)
+    assert test_array_surp[7]["ə"] == -1, "Zero-count cell in numpy backend is not -1!"
+    for row, array_row in zip(test_phonotac_surp, test_array_surp):
+        for key in row.keys():
+            if key != "syllable":
+                assert round(row[key], 7) == round(array_row[key], 7), "Incorrect surprisal from numpy backend!"
+    assert ita.get_phontactic_entropies([]) == itf.get_phontactic_entropies([]), "Empty table fails in numpy backend!"
+    print("Test 6 was successful!")
+
+# test 7: rule_compiler
+print("Test 7: rule cascade compiler...")
+test_rules = [{"type": "phon", "original": "rr", "result": "ɾ"}, {"type": "phon", "original": "rt", "result": "ʈ"},
+              {"type": "phon", "original": "r", "result": "ɻ"}, {"type": "phon", "original": "a", "result": "ɐ"},
+              {"type": "phon", "original": "ɐɻ", "result": "ɐr"}, {"type": "phon", "original": "^ɐ", "result": "ɐ"},
+              {"type": "syl", "original": "(?<=[ɐəiu])(?=[^ɐəiu][ɐəiu])", "result": "."}]
+test_plan = rule_compiler.analyse_cascade(test_rules)
+assert [rule_pass["rules"] for rule_pass in test_plan] == [[0, 1, 2, 3], [4], [5], [6]], "Wrong rules were fused!"
+test_phon, test_syl = rule_compiler.build_passes(test_rules, test_plan)
+for test_word in ["arrarta", "rarta", "tyarr", ""]:
+    cascade_word = test_word
+    for rule in test_rules:
+        cascade_word = re.sub(rule["original"], rule["result"], cascade_word)
+    compiled_word = test_word
+    for pattern, replacement in test_phon + test_syl:
+        compiled_word = pattern.sub(replacement, compiled_word)
+    assert compiled_word == cascade_word, "Compiled rules do not match the rule cascade!"
+# a plan cached by another version of the compiler is not reused
+with tempfile.TemporaryDirectory() as test_dir:
+    test_rules_dir = os.path.join(test_dir, "rules")
+    os.mkdir(test_rules_dir)
+    lex_io.write_dict_to_csv(test_rules, "rules", test_rules_dir)
+    test_rules_path = test_rules_dir + "\\rules.csv"
+    rule_compiler.compile_rule_file(test_rules_path, test_rules_dir)
+    test_cache_path = os.path.join(test_rules_dir, rule_compiler.CACHE_NAME)
+    with open(test_cache_path, encoding="utf-8") as f:
+        test_cache = json.load(f)
+    test_cache.update({"compiler_hash": "old", "plan": test_cache["plan"][1:]})
+    with open(test_cache_path, "w", encoding="utf-8") as f:
+        json.dump(test_cache, f)
+    assert rule_compiler.compile_rule_file(test_rules_path, test_rules_dir)[1] == test_plan, \
+        "Plan of another compiler version was reused!"
+print("Test 7 was successful!")
+
+# test 8: CountState
+print("Test 8: mergeable count state...")
+test_state = CountState().add_lexicon(lexicon[:3]).merge(CountState().add_lexicon(lexicon[3:]))
+test_state = CountState.from_dict(test_state.to_dict())
+assert test_state.lexeme_count == 7, "Wrong number of lexemes in count state!"
+assert test_state.get_frequency_rows(config_list) == test_phonotac_freq, "Count state frequencies do not match!"
+assert set(test_state.get_configurations()) == set(config_list), "Count state configurations do not match!"
+print("Test 8 was successful!")
+
+# test 9: get_leave_one_out_surprisals_of_lexicon
+print("Test 9: leave-one-out lexical surprisals...")
+test_loo_surp = itf.get_leave_one_out_surprisals_of_lexicon(lexicon, test_phonotac_freq)
+# 'ɰ' only occurs once as a second syllable onset
+assert test_loo_surp[0]["mean_surprisal"] == -1, "Configuration with no other occurrence was not marked!"
+assert test_loo_surp[0]["unseen_positions"] == 1, "Wrong number of unseen positions!"
+# with every lexeme twice, leaving one out gives the same model as the lexicon without that lexeme
+double_lexicon = lexicon + lexicon
+double_loo_surp = itf.get_leave_one_out_surprisals_of_lexicon(
+    double_lexicon, itf.get_frequency_of_each_config_in_word_position(double_lexicon, config_list))
+for i in range(len(lexicon)):
+    held_out_lexicon = double_lexicon[:i] + double_lexicon[i + 1:]
+    held_out_surp = itf.get_phonotactic_surprisals(
+        itf.get_frequency_of_each_config_in_word_position(held_out_lexicon, config_list))
+    assert double_loo_surp[i]["mean_surprisal"] == \
+        itf.get_surprisals_of_lexicon([lexicon[i]], held_out_surp)[0]["mean_surprisal"], \
+        "Leave-one-out surprisal does not match the held-out model!"
+print("Test 9 was successful!")
+
+# test 10: PhonotacticModel updates
+print("Test 10: incremental model updates...")
+test_model = PhonotacticModel.from_lexicon(lexicon[:4])
+changed_positions = test_model.update(add=lexicon[4:], remove=["ɐ.ɰə", "ə.ḻə"])
+updated_lexicon = lexicon[1:3] + lexicon[4:]
+assert test_model.get_lexicon() == updated_lexicon, "Model lexicon was not updated in order!"
+assert "final_coda" in changed_positions, "Changed position was not recalculated!"
+updated_configs = sorted(get_configurations(updated_lexicon))
+updated_freq = itf.get_frequency_of_each_config_in_word_position(updated_lexicon, updated_configs)
+updated_surp = itf.get_phonotactic_surprisals(updated_freq)
+assert test_model.get_frequency_rows() == updated_freq, "Model frequencies do not match a full recount!"
+assert test_model.get_entropies() == itf.get_phontactic_entropies(updated_freq), "Model entropies do not match!"
+assert test_model.get_surprisal_rows() == updated_surp, "Model surprisals do not match!"
+assert test_model.get_lexical_surprisals() == itf.get_surprisals_of_lexicon(updated_lexicon, updated_surp), \
+    "Model lexical surprisals do not match!"
+# a saved model is restored without counting its lexicon again
+with tempfile.TemporaryDirectory() as temp_dir:
+    test_model_path = os.path.join(temp_dir, "model.json")
+    test_model.save(test_model_path)
+    test_loaded = PhonotacticModel.load(test_model_path)
+for test_attribute in ["entries", "lexeme_entries", "next_entry", "word_positions", "counts", "config_totals",
+                       "syl_counts", "config_list", "labels", "entropies", "surprisals", "scores"]:
+    assert getattr(test_loaded, test_attribute) == getattr(test_model, test_attribute), \
+        "Loaded model differs in " + test_attribute + "!"
+test_loaded.update(remove=["ku.nə"])
+test_model.update(remove=["ku.nə"])
+assert test_loaded.get_lexical_surprisals() == test_model.get_lexical_surprisals(), "Loaded model updates differently!"
+print("Test 10 was successful!")
+
+# test 11: SurprisalScorer
+print("Test 11: surprisal scoring service...")
+test_scorer = SurprisalScorer(itf.get_surprisal_index(test_phonotac_surp))
+for out_dict in test_lex_surp:
+    assert test_scorer.score(out_dict["lexeme"])["mean_surprisal"] == out_dict["mean_surprisal"], \
+        "Scored form does not match lexical surprisals!"
+# 'ʈw' never occurs as an initial syllable onset
+assert test_scorer.score("ʈwɐ.nə")["mean_surprisal"] == -1, "Unseen configuration was not marked!"
+test_response = json.loads(handle_request(test_scorer, '{"id": 7, "forms": ["ku.nə", "kn"]}'))
+assert test_response["id"] == 7 and len(test_response["results"]) == 2, "Wrong response to request!"
+assert "error" in test_response["results"][1], "Form without a vowel was not reported!"
+assert "error" in json.loads(handle_request(test_scorer, "not json")), "Malformed request was not reported!"
+for test_request in ['{"forms": 5}', '{"forms": "ku.nə"}', '[1, 2]']:
+    assert "error" in json.loads(handle_request(test_scorer, test_request)), "Malformed forms were not reported!"
+print("Test 11 was successful!")
+
+# test 12: EncodedLexicon
+print("Test 12: encoded lexicon...")
+test_encoded_lex = EncodedLexicon.from_lexicon(lexicon, config_list)
+assert list(test_encoded_lex) == lexicon, "Decoded lexicon does not match!"
+assert list(test_encoded_lex[2:5]) == lexicon[2:5], "Slice of encoded lexicon does not match!"
+assert itf.get_frequency_rows_from_counts(*test_encoded_lex.get_positional_counts(), config_list) == \
+    test_phonotac_freq, "Frequencies of encoded lexicon do not match!"
+assert test_encoded_lex.get_surprisals(itf.get_surprisal_index(test_phonotac_surp)) == test_lex_surp, \
+    "Surprisals of encoded lexicon do not match!"
+assert test_encoded_lex.get_leave_one_out_surprisals(test_phonotac_freq) == test_loo_surp, \
+    "Leave-one-out surprisals of encoded lexicon do not match!"
+# the functions and models built on itf hand an encoded lexicon to its methods, so iterating it (which decodes every
+# lexeme, to be split again) is disabled while they run
+test_iter = EncodedLexicon.__iter__
+EncodedLexicon.__iter__ = None
+try:
+    assert itf.get_frequency_of_each_config_in_word_position(test_encoded_lex, config_list) == test_phonotac_freq, \
+        "Frequencies of encoded lexicon do not match!"
+    assert itf.get_surprisals_of_lexicon(test_encoded_lex, test_phonotac_surp) == test_lex_surp, \
+        "Surprisals of encoded lexicon do not match!"
+    assert itf.get_leave_one_out_surprisals_of_lexicon(test_encoded_lex, test_phonotac_freq) == test_loo_surp, \
+        "Leave-one-out surprisals of encoded lexicon do not match!"
+    assert list(itf.iter_word_positions(test_encoded_lex)) == list(itf.iter_word_positions(lexicon)), \
+        "Positions of encoded lexicon do not match!"
+    assert ConditionalModel.from_lexicon(test_encoded_lex).get_surprisals_of_lexicon(test_encoded_lex) == \
+        ConditionalModel.from_lexicon(lexicon).get_surprisals_of_lexicon(lexicon), \
+        "Conditional surprisals of encoded lexicon do not match!"
+    assert PhonotacticModel.from_lexicon(test_encoded_lex).get_lexical_surprisals() == test_lex_surp, \
+        "Model of encoded lexicon does not match!"
+finally:
+    EncodedLexicon.__iter__ = test_iter
+print("Test 12 was successful!")
+
+# test 13: syllable_parser
+print("Test 13: syllable parser...")
+assert syllable_parser.split_syllable("ʈwi:") == ("ʈw", "i:", "0"), "Wrong split of syllable with long vowel!"
+assert syllable_parser.split_syllable("ɐɾ") == ("0", "ɐ", "ɾ"), "Wrong split of syllable with no onset!"
+for bad_syl in ["kn", "ɐnə", "iu:k"]:
+    try:
+        syllable_parser.split_syllable(bad_syl)
+        raise AssertionError("Syllable without a single nucleus was not rejected: " + bad_syl)
+    except syllable_parser.SyllableError:
+        pass
+syllable_parser.clear_cache()
+syllable_parser.split_syllable("ku")
+syllable_parser.split_syllable("ku")
+assert syllable_parser.get_cache_stats()["hits"] == 1, "Repeated syllable was not read from the memo!"
+print("Test 13 was successful!")
+
+# test 14: bootstrap entropy intervals. This is skipped if numpy is not installed.
+if ita is not None:
+    import bootstrap
+    print("Test 14: bootstrap entropy intervals...")
+    for method in bootstrap.METHODS:
+        test_ci = bootstrap.get_entropy_intervals(lexicon, config_list, replicates=200, method=method, seed=1,
+                                                  batch_size=64)
+        assert [row["syl"] for row in test_ci] == [row["syl"] for row in test_entropies], "Wrong interval positions!"
+        for row in test_ci:
+            assert row["ci_lower"] <= row["ci_upper"], "Interval bounds are in the wrong order!"
+        # final codas are always empty, so every replicate has an entropy of 0
+        assert test_ci[-1]["ci_upper"] == 0, "Position with one configuration has a non-zero interval!"
+        assert bootstrap.get_entropy_intervals(lexicon, config_list, replicates=200, method=method, seed=1,
+                                               batch_size=64) == test_ci, "Seeded bootstrap is not reproducible!"
+    print("Test 14 was successful!")
+
+# test 15: sparse positional tables
+print("Test 15: long and binary positional tables...")
+with tempfile.TemporaryDirectory() as temp_dir:
+    # documents are written to out_dir + "\\" + name, so a subfolder keeps them inside temp_dir on every platform
+    table_dir = os.path.join(temp_dir, "tables")
+    os.mkdir(table_dir)
+    lex_io.write_positional_table_long(test_phonotac_freq, test_phonotac_surp, table_dir)
+    lex_io.write_positional_table_binary(test_phonotac_freq, test_phonotac_surp, table_dir)
+    for extension in [".csv", ".bin"]:
+        test_fqs, test_surs = lex_io.read_positional_table(table_dir + "\\positional_table" + extension, config_list)
+        assert test_fqs == test_phonotac_freq, "Frequencies read from " + extension + " table do not match!"
+        assert test_surs == test_phonotac_surp, "Surprisals read from " + extension + " table do not match!"
+    # the format of the last run is recorded, whichever documents of earlier runs are in the folder
+    for test_format in ["wide", "long"]:
+        pitd.produce_info_theory_docs(lexicon, sorted(config_list), table_dir, table_format=test_format)
+    with open(table_dir + "\\" + pitd.TABLE_FORMAT_NAME + ".txt", encoding="utf-8") as f:
+        assert f.read().strip() == "long", "Table format was not recorded!"
+print("Test 15 was successful!")
+
+# test 16: grouped analysis
+print("Test 16: grouped lexicon...")
+# lexemes can be in several groups, or in none
+test_groups = [["initial ɐ", "other"] if lexeme.startswith("ɐ") else ["other"] for lexeme in lexicon]
+test_groups[4] = []
+test_parts = test_encoded_lex.split_by_group(test_groups)
+assert list(test_parts) == ["initial ɐ", "other"], "Wrong groups!"
+assert list(test_parts["initial ɐ"]) == [lexeme for lexeme in lexicon if lexeme.startswith("ɐ")], \
+    "Lexemes of group do not match!"
+assert test_parts["other"].get_positional_counts() == itf.get_positional_counts(lexicon[:4] + lexicon[5:]), \
+    "Counts of group do not match!"
+with tempfile.TemporaryDirectory() as temp_dir:
+    os.mkdir(os.path.join(temp_dir, "pooled"))
+    os.mkdir(os.path.join(temp_dir, "ku"))
+    test_docs = pitd.produce_info_theory_docs(lexicon, sorted(config_list), os.path.join(temp_dir, "pooled"),
+                                              groups={"first": [lexeme[0] for lexeme in lexicon]})
+    test_ku_docs = pitd.produce_info_theory_docs(["ku.nə"], ["0", "k", "n", "u", "ə"], os.path.join(temp_dir, "ku"))
+assert test_docs["phonotactic_fqs"] == test_phonotac_freq, "Pooled frequencies changed with groups!"
+assert test_docs["groups"][("first", "k")] == test_ku_docs, "Documents of group do not match a separate analysis!"
+print("Test 16 was successful!")
+
+# test 17: instrumentation
+print("Test 17: run report...")
+test_original = itf.get_positional_counts
+test_report = instrumentation.RunReport(trace=True)
+with test_report.stage("counting") as test_counters:
+    itf.get_frequency_of_each_config_in_word_position(lexicon, config_list)
+    test_counters["lexemes"] = len(lexicon)
+test_report.close()
+assert itf.get_positional_counts is test_original, "Hot function was not restored!"
+test_stage = test_report.to_dict()["stages"][0]
+assert test_stage["counters"] == {"lexemes": len(lexicon)}, "Wrong stage counters!"
+assert test_stage["functions"]["info_theory_functions.get_positional_counts"]["calls"] == 1, \
+    "Call of hot function was not recorded!"
+assert test_stage.get("peak_rss_bytes", test_stage.get("peak_traced_bytes", 0)) > 0, \
+    "Peak memory of stage was not recorded!"
+test_report = instrumentation.RunReport()
+with test_report.stage("untraced"):
+    pass
+test_stage = test_report.to_dict()["stages"][0]
+assert "functions" not in test_stage, "Hot functions were timed without trace!"
+assert "peak_rss_bytes" in test_stage or "peak_traced_bytes" in test_stage, "Peak memory needs trace!"
+# the peak of a stage is its own, not that of a heavier stage before it
+with test_report.stage("heavy"):
+    test_block = b"k" * (64 * 1024 * 1024)
+    del test_block
+with test_report.stage("light"):
+    pass
+test_heavy, test_light = test_report.to_dict()["stages"][1:]
+test_peak_key = "peak_rss_bytes" if "peak_rss_bytes" in test_heavy else "peak_traced_bytes"
+assert test_heavy[test_peak_key] - test_light[test_peak_key] > 32 * 1024 * 1024, "Peak memory was not per stage!"
+print("Test 17 was successful!")
+
+# test 18: summary tables
+print("Test 18: summary tables...")
+test_entropy_tab = summary_tables.get_entropy_table(test_entropies)
+assert list(test_entropy_tab["label_names"][:2]) == ["Syllable 1 onset", "Syllable 1 nucleus"], "Wrong entropy labels!"
+assert "final_coda" not in list(test_entropy_tab["syl"]), "final_coda was not removed from the entropy table!"
+test_lexeme_tab = summary_tables.get_lexeme_categories(test_lex_surp)
+assert list(test_lexeme_tab["cat"]) == ["V_2", "V_3", "V_3", "V_2", "C_2", "C_2", "V_2"], "Wrong lexeme categories!"
+test_category_tab = summary_tables.get_surprisal_categories(test_lexeme_tab)
+assert list(test_category_tab["cats"]) == ["V_2", "V_3", "C_2"], "Categories are not in order of first appearance!"
+test_v3_surps = [row["mean_surprisal"] for row in test_lex_surp[1:3]]
+assert round(sum(test_v3_surps) / 2, 4) == test_category_tab["mean_surp"][1], "Wrong mean surprisal of category!"
+test_frequency_tab = summary_tables.get_category_frequencies(test_lexeme_tab, test_entropy_tab)
+assert list(test_frequency_tab["Freq"]) == [2, 3, 2], "Wrong category frequencies!"
+# a lexeme with three vowels: every position of its first two syllables, the onset of its last, and final_nucleus
+test_v3_labels = ["0_onset", "0_nucleus", "0_coda", "1_onset", "1_nucleus", "1_coda", "2_onset", "final_nucleus"]
+test_v3_entropy = sum(row["entropy"] for row in test_entropies if row["syl"] in test_v3_labels)
+assert abs(test_frequency_tab["sum_entropy"][2] - test_v3_entropy) < 1e-12, "Wrong sum entropy of category!"
+test_template_tab = summary_tables.get_syllable_templates(test_lexeme_tab)
+test_totals = test_template_tab[test_template_tab["."] == "Total"]
+assert list(test_totals[test_totals["num_syls"] == "2"]["Freq"]) == ["5"], "Wrong total of two-syllable templates!"
+print("Test 18 was successful!")
+
+# test 19: conditional model
+print("Test 19: conditional model...")
+# without context, the conditional model is the positional model
+test_unigram = ConditionalModel.from_lexicon(lexicon, 0)
+for row, conditional_row in zip(test_entropies, test_unigram.get_conditional_entropies()):
+    assert row["syl"] == conditional_row["syl"], "Wrong conditional entropy position!"
+    assert round(row["entropy"], 7) == round(conditional_row["entropy"], 7), "Order 0 entropy differs from unigram!"
+for row, conditional_row in zip(test_lex_surp, test_unigram.get_surprisals_of_lexicon(lexicon)):
+    assert round(row["mean_surprisal"], 7) == round(conditional_row["mean_surprisal"], 7), \
+        "Order 0 lexical surprisal differs from unigram!"
+test_bigram = ConditionalModel.from_lexicon(lexicon, 1)
+# initial nucleus given initial onset: 0 is followed by 4 'ɐ' and 1 'ə', k and p are each followed by one nucleus
+test_nucleus_entropy = 5/7 * (((log(4/5, 2) * -1) * 4/5) + ((log(1/5, 2) * -1) * 1/5))
+assert round(test_bigram.get_conditional_entropies()[1]["entropy"], 7) == round(test_nucleus_entropy, 7), \
+    "Incorrect conditional entropy value!"
+assert len(test_bigram.counts) < len(test_bigram.label_totals) * len(config_list), "Contexts are not sparse!"
+test_unseen = test_bigram.get_surprisals_of_lexicon(["ku.nə", "tɐ.nə"])
+assert test_unseen[0]["unseen_positions"] == 0, "Seen lexeme has unseen positions!"
+assert test_unseen[1]["unseen_positions"] > 0 and test_unseen[1]["mean_surprisal"] == -1, "Unseen onset not reported!"
+print("Test 19 was successful!")
+
+# test 20: lexicon validation
+print("Test 20: lexicon validation...")
+test_bad_lexicon = lexicon[:2] + ["ṯm.pə", "ɐ.ku.ntw"] + lexicon[2:]
+test_malformed = validate_lexicon.validate_lexicon(test_bad_lexicon)
+assert [row["line"] for row in test_malformed] == [3, 4], "Wrong lines of malformed lexemes!"
+assert test_malformed[1]["reason"].startswith("syllable 3:"), "Wrong malformed syllable!"
+assert validate_lexicon.validate_lexicon(lexicon) == [], "Well-formed lexicon was reported as malformed!"
+try:
+    validate_lexicon.check_lexicon(test_bad_lexicon)
+    assert False, "Malformed lexicon was not rejected!"
+except validate_lexicon.LexiconError as error:
+    assert error.errors == test_malformed, "Not every malformed lexeme was reported!"
+with tempfile.TemporaryDirectory() as test_dir:
+    test_quarantine_dir = os.path.join(test_dir, "quarantine")
+    os.mkdir(test_quarantine_dir)
+    test_clean, _ = validate_lexicon.check_lexicon(test_bad_lexicon, test_quarantine_dir, quarantine=True)
+    assert test_clean == lexicon, "Quarantined lexemes were not removed from the lexicon!"
+    test_quarantined = lex_io.read_csv(test_quarantine_dir + "\\" + validate_lexicon.QUARANTINE_NAME + ".csv")
+    assert [row["lexeme"] for row in test_quarantined] == ["ṯm.pə", "ɐ.ku.ntw"], "Wrong quarantined lexemes!"
+print("Test 20 was successful!")
+
+# test 21: sharded analysis. Worker processes started with spawn (Windows) import this script again, so they skip it.
+if __name__ == "__main__":
+    print("Test 21: sharded analysis...")
+    test_state = sharded_analysis.get_count_state_parallel(lexicon, 2, shard_size=2)
+    assert (test_state.counts, test_state.max_syl) == itf.get_positional_counts(lexicon), \
+        "Sharded counts differ from a single process!"
+    assert sharded_analysis.get_surprisals_of_lexicon_parallel(lexicon, test_phonotac_surp, 2, shard_size=2) == \
+        test_lex_surp, "Sharded surprisals differ from a single process!"
+    with tempfile.TemporaryDirectory() as temp_dir:
+        test_docs = {}
+        test_texts = {}
+        for test_workers in [1, 2]:
+            test_out_dir = os.path.join(temp_dir, "workers_" + str(test_workers))
+            os.mkdir(test_out_dir)
+            test_docs[test_workers] = pitd.produce_info_theory_docs(lexicon, sorted(config_list), test_out_dir,
+                                                                    workers=test_workers)
+            test_texts[test_workers] = {}
+            for name in pitd.DOCUMENT_NAMES:
+                with open(test_out_dir + "\\" + name + ".csv", encoding="utf-8") as f:
+                    test_texts[test_workers][name] = f.read()
+    for name in pitd.DOCUMENT_NAMES:
+        assert test_docs[2][name] == test_docs[1][name], name + " differs between 1 and 2 workers!"
+        assert test_texts[2][name] == test_texts[1][name], name + ".csv differs between 1 and 2 workers!"
+    print("Test 21 was successful!")
+
 # Final testing message after no assertion errors have occurred.
 print("No assertion errors were raised during testing.")
\ No newline at end of file
@@ -0,0 +1,130 @@
+"""
+NAME: validate_lexicon.py
+CREATED: 18-OCT-26
+LAST EDIT: 18-OCT-26
+CREATOR: Author
+EMAIL:  62926253+kroot-kaytetye@users.noreply.github.com
+PROJECT: kroot
+SUMMARY: Checks a syllabified lexicon (phon_syls.txt) in a single pass before it is analysed, so that a malformed
+        lexeme is found before the expensive stages start rather than part way through them. Every syllable is split
+        with syllable_parser.split_syllable, so the vowel inventory and rules are those of the analysis, and every
+        malformed lexeme is reported with its line number and the reasons it was rejected. Lexemes can be quarantined:
+        they are written to quarantined_lexemes.csv, and the analysis continues with the rest of the lexicon.
+        Called by pipeline.py, or run on phon_syls.txt, in which case the exit status is 1 if any lexeme is malformed.
+EXAMPLE CALL: python validate_lexicon.py C:\\docs\\kroot_docs\\py_outputs\\phon_syls.txt --quarantine
+CLASSES:
+    LexiconError
+FUNCTIONS:
+    get_lexeme_errors
+    validate_lexicon
+    get_clean_lexicon
+    write_quarantine
+    check_lexicon
+"""
+import argparse
+import os
+import sys
+import lex_io
+import syllable_parser
+
+QUARANTINE_NAME = "quarantined_lexemes"
+# malformed lexemes listed in the message of a LexiconError
+MAX_REPORTED_LEXEMES = 20
+
+
+class LexiconError(ValueError):
+    """
+    Raised for a lexicon with malformed lexemes. errors holds every one of them, as returned by validate_lexicon.
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+        lines = ["line " + str(error["line"]) + " (" + error["lexeme"] + "): " + error["reason"]
+                 for error in errors[:MAX_REPORTED_LEXEMES]]
+        if len(errors) > MAX_REPORTED_LEXEMES:
+            lines.append("... and " + str(len(errors) - MAX_REPORTED_LEXEMES) + " more")
+        super().__init__(str(len(errors)) + " malformed lexemes in the syllabified lexicon:\n" + "\n".join(lines))
+
+
+##########################################
+# Public Functions
+##########################################
+def get_lexeme_errors(lexeme):
+    """
+    Returns the reason each malformed syllable of a lexeme was rejected by the syllable parser, numbered from 1.
+    """
+    errors = []
+    for i, syllable in enumerate(lexeme.split(".")):
+        try:
+            syllable_parser.split_syllable(syllable)
+        except syllable_parser.SyllableError as error:
+            errors.append("syllable " + str(i + 1) + ": " + str(error))
+    return errors
+
+
+def validate_lexicon(syl_lex):
+    """
+    Returns a row for each malformed lexeme of a syllabified lexicon, with its line number (from 1), the lexeme and
+    the reasons it was rejected, separated by semicolons.
+    """
+    out_dict_list = []
+    for i, lexeme in enumerate(syl_lex):
+        errors = get_lexeme_errors(lexeme)
+        if len(errors) > 0:
+            out_dict_list.append({"line": i + 1, "lexeme": lexeme, "reason": "; ".join(errors)})
+    return out_dict_list
+
+
+def get_clean_lexicon(syl_lex, errors):
+    """
+    Returns the lexicon without the lexemes in errors. This also works on any list in the order of the lexicon, e.g.
+    the groups of its lexemes.
+    """
+    malformed_lines = set(error["line"] for error in errors)
+    return [lexeme for i, lexeme in enumerate(syl_lex) if i + 1 not in malformed_lines]
+
+
+def write_quarantine(errors, out_dir):
+    """
+    Writes the malformed lexemes to quarantined_lexemes.csv in out_dir, and returns its path. If there are none, an
+    existing quarantine document is removed, so that it never belongs to an earlier run.
+    """
+    path = out_dir + "\\" + QUARANTINE_NAME + ".csv"
+    if len(errors) > 0:
+        lex_io.write_dict_to_csv(errors, QUARANTINE_NAME, out_dir)
+    elif os.path.exists(path):
+        os.remove(path)
+    return path
+
+
+def check_lexicon(syl_lex, out_dir=None, quarantine=False):
+    """
+    Validates a syllabified lexicon. Without quarantine, a LexiconError listing the malformed lexemes is raised if there
+    are any. With quarantine, they are written to out_dir (see write_quarantine). Returns the lexicon without the
+    malformed lexemes, and the rows of validate_lexicon.
+    """
+    errors = validate_lexicon(syl_lex)
+    if quarantine:
+        if out_dir is not None:
+            write_quarantine(errors, out_dir)
+        if len(errors) > 0:
+            print("Quarantined " + str(len(errors)) + " malformed lexemes.")
+    elif len(errors) > 0:
+        raise LexiconError(errors)
+    return get_clean_lexicon(syl_lex, errors), errors
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("syl_lex_dir")
+    parser.add_argument("--quarantine", action="store_true",
+                        help="write the malformed lexemes to quarantined_lexemes.csv, next to the lexicon")
+    args = parser.parse_args()
+
+    malformed = validate_lexicon(lex_io.read_lexicon_file(args.syl_lex_dir))
+    for row in malformed:
+        print("line " + str(row["line"]) + " (" + row["lexeme"] + "): " + row["reason"])
+    if args.quarantine:
+        write_quarantine(malformed, os.path.dirname(args.syl_lex_dir))
+    print(str(len(malformed)) + " malformed lexemes.")
+    sys.exit(1 if len(malformed) > 0 else 0)